@@ -0,0 +1,48 @@
+import math
+
+def parse(raw):
+    """The canonical number for a submitted answer, or None if it's invalid.
+
+    Times ("HH:MM") become total minutes; anything else must be a finite
+    number.
+    """
+    if isinstance(raw, str) and ':' in raw:
+        try:
+            hours, minutes = raw.split(':')
+            return int(hours) * 60 + int(minutes)
+        except (ValueError, TypeError):
+            return None
+    try:
+        value = float(raw)
+    except (ValueError, TypeError):
+        return None
+    return value if math.isfinite(value) else None
+
+def format_time(minutes):
+    """Minutes as "HH:MM" ("" if it isn't a number)"""
+    try:
+        total_minutes = int(float(minutes))
+    except (ValueError, TypeError):
+        return ''
+    return f"{total_minutes // 60:02d}:{total_minutes % 60:02d}"
+
+def format_value(value, question_type):
+    """How a stored answer is shown: "HH:MM" for times, else the number
+    without a trailing ".0" (and at most two decimals)"""
+    if question_type == 'time':
+        return format_time(value)
+    value = round(float(value), 2)
+    if value.is_integer():
+        return str(int(value))
+    return f'{value:.2f}'.rstrip('0')
+
+def display_unit(question_type, unit):
+    """The unit shown next to an answer — times carry their own format"""
+    return '' if question_type == 'time' else (unit or '')
+
+def encode(raw, question_type, unit):
+    """(value, display, unit) to store for a raw answer, or None if invalid"""
+    value = parse(raw)
+    if value is None:
+        return None
+    return value, format_value(value, question_type), display_unit(question_type, unit)
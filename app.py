@@ -1,21 +1,33 @@
+import json
 import os
 import random
 import secrets
-import qrcode
-from PIL import Image, ImageDraw, ImageFont
-from io import BytesIO
+import threading
+import time
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import Flask, render_template, request, session, redirect, url_for, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, session, redirect, url_for, jsonify
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 
 from config import Config
 import database as db
+import scoring
+import answer_codec
+import qr_render
+from qr_queue import QRRenderQueue, pregenerate_guest_qr_codes
+from live_updates import LiveUpdates
+import build_assets
+from session_store import ServerSessionInterface
+from page_cache import PageCache
+from metrics import metrics
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = Config.SECRET_KEY
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.permanent_session_lifetime = timedelta(hours=24)
+if Config.SESSION_BACKEND == 'server':
+    app.session_interface = ServerSessionInterface(ttl=Config.SESSION_TIMEOUT, cache_size=Config.SESSION_CACHE_SIZE)
 
 # Ensure directories exist
 os.makedirs(Config.QR_CODE_DIR, exist_ok=True)
@@ -25,26 +37,55 @@ os.makedirs('data', exist_ok=True)
 @app.template_filter('format_time')
 def format_time_filter(minutes):
     """Convert minutes to HH:MM format for time input"""
-    try:
-        total_minutes = int(float(minutes))
-        hours = total_minutes // 60
-        mins = total_minutes % 60
-        return f"{hours:02d}:{mins:02d}"
-    except (ValueError, TypeError):
-        return ""
+    return answer_codec.format_time(minutes)
 
 # Initialize database on startup (only once)
 _db_initialized = False
+_db_init_lock = threading.Lock()
 
-@app.before_request
-def initialize():
+def init_app_data():
+    """Create tables, sync questions and guests, and resume QR renders.
+
+    Runs once per process, before serving when started via `python app.py`.
+    """
     global _db_initialized
-    if not _db_initialized:
+    with _db_init_lock:
+        if _db_initialized:
+            return
         db.init_db()
-        db.load_questions_from_config()
-        db.load_guests_from_csv(Config.GUESTS_CSV_PATH)
+        db.sync_data(Config.GUESTS_CSV_PATH)
+        if isinstance(app.session_interface, ServerSessionInterface):
+            app.session_interface.purge_expired()
+        scoring.invalidate()
+        qr_renderer.resume_pending()
         _db_initialized = True
 
+@app.before_request
+def initialize():
+    # Fallback for when the app is imported by another server
+    if not _db_initialized:
+        init_app_data()
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+@app.before_request
+def start_request_timer():
+    if metrics.enabled:
+        metrics.start_request()
+
+@app.after_request
+def record_request_timing(response):
+    """Record the request's timing and report it in a Server-Timing header"""
+    if metrics.enabled:
+        timing = metrics.finish_request(request.endpoint or '<unmatched>')
+        if timing:
+            total_ms, queries, query_ms = timing
+            response.headers['Server-Timing'] = (f'db;dur={query_ms:.1f};desc="{queries} queries", '
+                                                 f'total;dur={total_ms:.1f}')
+    return response
+
 # ============================================================================
 # AUTHENTICATION DECORATOR
 # ============================================================================
@@ -58,99 +99,165 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# ============================================================================
+# CONDITIONAL GET
+# ============================================================================
+
+def conditional_json(build):
+    """JSON response tagged with the database's data version.
+
+    Returns 304 when the client's If-None-Match is still current; build() is
+    only called when it isn't, so unchanged polls never touch the database.
+    """
+    version = db.get_data_version()
+
+    if version in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 # ============================================================================
 # QR CODE GENERATION
 # ============================================================================
 
-def generate_guest_qr(guest_id, guest_name):
-    """Generate a QR code for a guest's answers with F+L centre overlay"""
+def generate_guest_qr(guest_id, guest_name, token=None):
+    """Assign a guest's QR code token and queue the image for rendering.
+
+    Returns straight away; the PNG appears at qr_code_path once the
+    background render finishes (see /api/qr-status/<token>). A token
+    pre-assigned by pregenerate_guest_qr_codes is reused, and if its image
+    is already rendered for the current URL nothing is queued.
+    """
     # Create unique token
-    token = secrets.token_urlsafe(16)
+    token = token or secrets.token_urlsafe(16)
 
     # Create QR code URL
-    url = f"{Config.BASE_URL}/answers/{token}"
+    url = qr_render.guest_qr_url(token)
 
-    # Generate QR code with HIGH error correction to allow centre overlay
-    qr = qrcode.QRCode(
-        version=None,
-        error_correction=qrcode.constants.ERROR_CORRECT_H,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(url)
-    qr.make(fit=True)
+    if not qr_render.is_rendered(token, url):
+        qr_renderer.submit(token, guest_id, url)
 
-    img = qr.make_image(fill_color="#0e0f1f", back_color="white").convert('RGBA')
+    return token, qr_render.qr_code_path(token), url
 
-    # Add F+L overlay in the centre
-    try:
-        img_w, img_h = img.size
-        # Centre circle size — ~18% of QR code width (safe with ERROR_CORRECT_H)
-        circle_radius = int(img_w * 0.09)
-        centre_x, centre_y = img_w // 2, img_h // 2
-
-        # Create overlay with transparent background
-        overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
-
-        # Draw white circle background with slight border
-        draw.ellipse(
-            [centre_x - circle_radius - 2, centre_y - circle_radius - 2,
-             centre_x + circle_radius + 2, centre_y + circle_radius + 2],
-            fill=(14, 15, 31, 255)  # groom-suit colour border
-        )
-        draw.ellipse(
-            [centre_x - circle_radius, centre_y - circle_radius,
-             centre_x + circle_radius, centre_y + circle_radius],
-            fill=(255, 255, 255, 255)
-        )
-
-        # Draw "F+L" text
-        font_size = int(circle_radius * 0.8)
-        try:
-            # Try to use bundled Cormorant Garamond
-            font_path = os.path.join('static', 'fonts', 'Cormorant_Garamond,Outfit',
-                                     'Cormorant_Garamond', 'static', 'CormorantGaramond-SemiBold.ttf')
-            font = ImageFont.truetype(font_path, font_size)
-        except (IOError, OSError):
-            try:
-                font = ImageFont.truetype("arial.ttf", font_size)
-            except (IOError, OSError):
-                font = ImageFont.load_default()
-
-        text = "F+L"
-        text_bbox = draw.textbbox((0, 0), text, font=font)
-        text_w = text_bbox[2] - text_bbox[0]
-        text_h = text_bbox[3] - text_bbox[1]
-        text_x = centre_x - text_w // 2
-        text_y = centre_y - text_h // 2 - text_bbox[1]  # Adjust for font baseline
-
-        draw.text((text_x, text_y), text, fill=(84, 15, 59, 255), font=font)  # confetti-dark colour
-
-        # Composite overlay onto QR code
-        img = Image.alpha_composite(img, overlay)
-        img = img.convert('RGB')
-    except Exception as e:
-        print(f"Warning: Could not add F+L overlay to QR code: {e}")
-        img = img.convert('RGB')
+qr_renderer = QRRenderQueue(qr_render.render_guest_qr, workers=Config.QR_RENDER_WORKERS)
 
-    # Save to file
-    filename = f"{token}.png"
-    filepath = os.path.join(Config.QR_CODE_DIR, filename)
-    img.save(filepath)
+@app.route('/api/qr-status/<token>')
+def api_qr_status(token):
+    """Report whether a guest's QR code image has been rendered yet"""
+    job = db.get_qr_job(token)
+    if job:
+        status = job['status']
+    elif qr_render.is_rendered(token):
+        status = 'ready'  # Rendered before render jobs were tracked
+    else:
+        return jsonify({'error': 'Unknown QR code'}), 404
 
-    qr_code_path = f"qr_codes/{filename}"
+    return jsonify({
+        'status': status,
+        'qr_code_path': qr_render.qr_code_path(token)
+    })
 
-    return token, qr_code_path, url
+@app.route('/static/qr_codes/<token>.png')
+def guest_qr_image(token):
+    """Serve a guest QR code from the in-memory cache (disk as fallback).
+
+    Shadows the generic static route for this folder so the stored
+    qr_code_path URLs keep working even with Config.QR_WRITE_TO_DISK off.
+    """
+    png = qr_render.get_guest_qr_png(token)
+    if png is None:
+        # Rendered but since evicted from the cache, with nothing on disk
+        job = db.get_qr_job(token)
+        if job is None or job['status'] != 'ready':
+            return "QR code not found", 404
+        png = qr_render.render_guest_qr(token, job['url'])
+    response = Response(png, mimetype='image/png')
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response
 
 # ============================================================================
 # PWA SERVICE WORKER
 # ============================================================================
 
+_asset_manifest = None
+_asset_manifest_lock = threading.Lock()
+
+def get_asset_manifest():
+    """Precache manifest ({'version', 'assets': {url: hash}}), loaded once per process"""
+    global _asset_manifest
+    if _asset_manifest is None:
+        with _asset_manifest_lock:
+            if _asset_manifest is None:
+                _asset_manifest = build_assets.load_manifest()
+    return _asset_manifest
+
+@app.url_defaults
+def version_static_urls(endpoint, values):
+    """Add ?v=<content hash> to precached static URLs"""
+    if endpoint == 'static' and 'v' not in values:
+        asset_hash = get_asset_manifest()['assets'].get(f"/static/{values.get('filename')}")
+        if asset_hash:
+            values['v'] = asset_hash
+
+@app.after_request
+def cache_versioned_assets(response):
+    """Versioned asset URLs never change content, so browsers may keep them"""
+    if (request.endpoint == 'static' and response.status_code == 200
+            and request.args.get('v') == get_asset_manifest()['assets'].get(request.path)):
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
 @app.route('/sw.js')
 def service_worker():
-    """Serve service worker from root path (required for PWA scope)"""
-    return send_from_directory('static', 'sw.js', mimetype='application/javascript')
+    """Serve service worker from root path (required for PWA scope).
+
+    The precache manifest is prepended, so changing any asset changes
+    sw.js and browsers install the new worker (and its new cache).
+    """
+    with open(os.path.join(app.static_folder, 'sw.js'), encoding='utf-8') as f:
+        script = f.read()
+    response = Response(f"const PRECACHE = {json.dumps(get_asset_manifest())};\n\n{script}",
+                        mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# ============================================================================
+# GAME TICKETS
+# ============================================================================
+# /start-game hands the kiosk a signed note of who is playing. The service
+# worker may replay a queued submission after the kiosk has moved on to the
+# next guest, so those requests say whose answers they are with the ticket
+# (X-Game-Ticket header) rather than the session.
+
+_game_tickets = URLSafeTimedSerializer(Config.SECRET_KEY, salt='game-ticket')
+
+def make_game_ticket(guest_id, guest_name, key):
+    return _game_tickets.dumps({'guest_id': guest_id, 'guest_name': guest_name, 'key': key})
+
+def load_game_ticket():
+    """The request's game ticket as a dict, or None if missing or invalid"""
+    ticket = request.headers.get('X-Game-Ticket')
+    if not ticket:
+        return None
+    try:
+        return _game_tickets.loads(ticket, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+
+def clean_answers(answers):
+    """Keep answers to known questions, as strings of at most 50 characters"""
+    valid_ids = db.get_question_registry().valid_ids
+    return {
+        str(question_id): str(answer)[:50]
+        for question_id, answer in answers.items()
+        if str(question_id) in valid_ids and isinstance(answer, (str, int, float))
+    }
 
 # ============================================================================
 # GUEST ROUTES
@@ -174,8 +281,24 @@ def api_guest_search():
     if len(query) < 1:
         return jsonify([])
 
-    guests = db.search_guests(query)
-    return jsonify(guests)
+    return conditional_json(lambda: db.search_guests(query))
+
+@app.route('/api/guests/snapshot')
+def api_guest_snapshot():
+    """Compact guest list for client-side search on the kiosk.
+
+    Clients send the version they hold in If-None-Match and get a 304 back
+    unless a guest has been added or has submitted since.
+    """
+    version, guests = db.get_guest_snapshot()
+
+    if version in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({'version': version, 'guests': guests})
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/start-game', methods=['POST'])
 def start_game():
@@ -212,8 +335,10 @@ def start_game():
                 return jsonify({'error': 'Guest name required'}), 400
 
         # Create session
+        game_key = secrets.token_urlsafe(16)
         session['guest_id'] = guest_id
         session['guest_name'] = guest_name
+        session['game_key'] = game_key
         session['current_question'] = 0
         session['answers'] = {}
         session.modified = True  # Ensure session is saved
@@ -221,7 +346,8 @@ def start_game():
         return jsonify({
             'success': True,
             'guest_name': guest_name,
-            'total_questions': len(db.get_questions())
+            'total_questions': len(db.get_questions()),
+            'ticket': make_game_ticket(guest_id, guest_name, game_key)
         })
     except Exception as e:
         print(f"Error in start_game: {e}")
@@ -236,18 +362,8 @@ def questions_all():
         if 'guest_id' not in session:
             return redirect(url_for('home'))
 
+        # Questions come with min/max from config already merged in
         questions = db.get_questions()
-        config_questions = {q['order']: q for q in Config.QUESTIONS}
-
-        # Merge min/max from config into each question
-        questions_data = []
-        for q in questions:
-            q_data = dict(q)
-            if q['order_index'] in config_questions:
-                cfg = config_questions[q['order_index']]
-                q_data['min'] = cfg.get('min')
-                q_data['max'] = cfg.get('max')
-            questions_data.append(q_data)
 
         # Get guest name
         if session.get('guest_id') == -1:
@@ -264,7 +380,7 @@ def questions_all():
         summary_quip = random.choice(Config.SUMMARY_QUIPS).format(name=first_name)
 
         return render_template('questions_all.html',
-                             questions=questions_data,
+                             questions=questions,
                              guest_name=guest_name,
                              answers=answers,
                              quip=summary_quip)
@@ -277,29 +393,23 @@ def questions_all():
 @app.route('/api/save-all-answers', methods=['POST'])
 def api_save_all_answers():
     """Save all answers at once from the grid view"""
+    ticket = load_game_ticket()
+    if ticket and ticket['key'] != session.get('game_key'):
+        # A save queued offline and replayed after the kiosk moved on; the
+        # queued /submit-final that follows carries the answers itself
+        return jsonify({'success': True, 'stale': True})
+
     if 'guest_id' not in session:
         return jsonify({'error': 'Session expired'}), 403
 
     data = request.get_json(silent=True) or {}
     answers = data.get('answers', {})
 
-    if not answers:
+    if not answers or not isinstance(answers, dict):
         return jsonify({'error': 'No answers provided'}), 400
 
     # Validate against known question IDs
-    questions = db.get_questions()
-    valid_ids = {str(q['id']) for q in questions}
-
-    if 'answers' not in session:
-        session['answers'] = {}
-
-    for question_id, answer in answers.items():
-        if str(question_id) not in valid_ids:
-            continue
-        if not isinstance(answer, (str, int, float)):
-            continue
-        session['answers'][str(question_id)] = str(answer)[:50]
-
+    session.setdefault('answers', {}).update(clean_answers(answers))
     session.modified = True
     return jsonify({'success': True})
 
@@ -318,13 +428,6 @@ def question(question_num):
 
         question = questions[question_num]
 
-        # Merge min/max values from config (not stored in database)
-        config_questions = {q['order']: q for q in Config.QUESTIONS}
-        if question['order_index'] in config_questions:
-            config_q = config_questions[question['order_index']]
-            question['min'] = config_q.get('min')
-            question['max'] = config_q.get('max')
-
         # Handle both database guests and manual entries
         if session.get('guest_id') == -1:
             # Manual guest entry
@@ -420,6 +523,7 @@ def summary():
         return render_template('summary.html',
                              guest=guest,
                              summary=summary_data,
+                             answers=answers,
                              summary_quip=summary_quip)
     except Exception as e:
         print(f"Error in summary route: {e}")
@@ -429,31 +533,50 @@ def summary():
 
 @app.route('/submit-final', methods=['POST'])
 def submit_final():
-    """Final submission of answers"""
-    if 'guest_id' not in session:
+    """Final submission of answers.
+
+    The guest normally comes from the session. A request with a game ticket
+    may also carry the answers in its body, which is how the service worker
+    replays a submission queued while the kiosk was offline.
+    """
+    ticket = load_game_ticket()
+    own_session = ticket is None or ticket['key'] == session.get('game_key')
+
+    if ticket:
+        guest_id = ticket['guest_id']
+        guest_name = ticket['guest_name']
+    elif 'guest_id' in session:
+        guest_id = session['guest_id']
+        guest_name = session.get('guest_name', 'Guest')
+    else:
         return jsonify({'error': 'Session expired'}), 403
 
-    guest_id = session['guest_id']
-    guest_name = session.get('guest_name', 'Guest')
+    answers = dict(session.get('answers', {})) if own_session else {}
+    body_answers = (request.get_json(silent=True) or {}).get('answers')
+    if isinstance(body_answers, dict):
+        answers.update(clean_answers(body_answers))
 
     # For manual entries, create a real guest record so they appear on leaderboard
     if guest_id == -1:
         try:
-            # Create a guest record in the database for this manual entry
-            new_guest_id = db.create_manual_guest(guest_name)
+            # The ticket's key doubles as the token, so a replayed
+            # submission can't create the same guest twice
+            token = ticket['key'] if ticket else secrets.token_urlsafe(16)
+            if db.get_guest_by_token(token):
+                return jsonify({'error': 'Already submitted'}), 403
 
-            # Save all answers to database under the new guest ID
-            answers = session.get('answers', {})
-            for question_id, answer in answers.items():
-                db.save_response(new_guest_id, int(question_id), answer)
+            # Create the guest, save their answers and mark them submitted
+            # in a single transaction
+            new_guest_id = db.submit_guest_answers(None, answers, qr_render.qr_code_path(token), token,
+                                                   full_name=guest_name)
 
             # Generate QR code
-            token, qr_path, qr_url = generate_guest_qr(new_guest_id, guest_name)
+            token, qr_path, qr_url = generate_guest_qr(new_guest_id, guest_name, token)
+            scoring.invalidate()
+            live_updates.publish()
 
-            # Mark as submitted
-            db.mark_guest_submitted(new_guest_id, qr_path, token)
-
-            session.clear()
+            if own_session:
+                session.clear()
             return jsonify({
                 'success': True,
                 'qr_code_path': qr_path,
@@ -466,25 +589,29 @@ def submit_final():
             traceback.print_exc()
             return jsonify({'error': 'Error saving answers'}), 500
 
+    guest = db.get_guest_by_id(guest_id)
+    if not guest:
+        return jsonify({'error': 'Guest not found in database'}), 404
+
     # Check if already submitted
-    if db.guest_has_submitted(guest_id):
+    if guest['has_submitted']:
         return jsonify({'error': 'Already submitted'}), 403
 
-    # Save all answers to database
-    answers = session.get('answers', {})
     try:
-        for question_id, answer in answers.items():
-            db.save_response(guest_id, int(question_id), answer)
+        # Save all answers and mark the guest submitted in one transaction;
+        # None means another kiosk submitted for them in the meantime
+        token = guest.get('unique_token') or secrets.token_urlsafe(16)
+        if db.submit_guest_answers(guest_id, answers, qr_render.qr_code_path(token), token) is None:
+            return jsonify({'error': 'Already submitted'}), 403
 
         # Generate QR code
-        guest = db.get_guest_by_id(guest_id)
-        token, qr_path, qr_url = generate_guest_qr(guest_id, guest['full_name'])
-
-        # Mark guest as submitted
-        db.mark_guest_submitted(guest_id, qr_path, token)
+        token, qr_path, qr_url = generate_guest_qr(guest_id, guest['full_name'], token)
+        scoring.invalidate()
+        live_updates.publish()
 
-        # Clear session
-        session.clear()
+        # Clear session (unless this is a replay and it belongs to the next guest)
+        if own_session:
+            session.clear()
 
         return jsonify({
             'success': True,
@@ -509,7 +636,8 @@ def confirmation(guest_id):
 
     return render_template('confirmation.html',
                          first_name=first_name,
-                         qr_code_path=qr_code_path)
+                         qr_code_path=qr_code_path,
+                         qr_token=guest['unique_token'])
 
 @app.route('/confirmation-complete')
 def confirmation_complete():
@@ -517,10 +645,13 @@ def confirmation_complete():
     qr_code_path = request.args.get('qr', '')
     full_name = request.args.get('name', 'Guest')
     first_name = full_name.split()[0] if full_name else 'Guest'
+    qr_token = os.path.splitext(os.path.basename(qr_code_path))[0]
 
     return render_template('confirmation.html',
                          first_name=first_name,
-                         qr_code_path=qr_code_path)
+                         qr_code_path=qr_code_path,
+                         qr_token=qr_token,
+                         queued=request.args.get('queued') == '1')
 
 @app.route('/qr-codes')
 def qr_codes_menu():
@@ -531,12 +662,14 @@ def qr_codes_menu():
 @app.route('/api/submitted-guests')
 def api_submitted_guests():
     """API endpoint to get list of submitted guests"""
-    submitted_guests = db.get_submitted_guests()
-    return jsonify([{
-        'id': g['id'],
-        'full_name': g['full_name'],
-        'qr_code_path': g['qr_code_path']
-    } for g in submitted_guests])
+    def build():
+        return [{
+            'id': g['id'],
+            'full_name': g['full_name'],
+            'qr_code_path': g['qr_code_path']
+        } for g in db.get_submitted_guests()]
+
+    return conditional_json(build)
 
 @app.route('/qr-codes/<int:guest_id>')
 def qr_code_display(guest_id):
@@ -546,63 +679,63 @@ def qr_code_display(guest_id):
         return redirect(url_for('qr_codes_menu'))
     return render_template('qr_code_display.html', guest=guest)
 
+answer_pages = PageCache(Config.ANSWER_PAGE_CACHE_SIZE)
+
+def render_guest_answers(guest):
+    """Render a submitted guest's answers page"""
+    responses = db.get_guest_responses(guest['id'])
+    registry = db.get_question_registry()
+
+    # Combine responses with questions
+    answers_data = []
+    for response in responses:
+        question = registry.get(response['question_id'])
+        if question:
+            short_label = question['short_label'] or question['question_text']
+
+            answers_data.append({
+                'question': question['question_text'],
+                'short_label': short_label,
+                'answer': response['answer_display'],
+                'unit': response['answer_unit'],
+                'type': question['question_type'],
+                'order': question['order_index']
+            })
+
+    return render_template('guest_answers.html',
+                         guest=guest,
+                         answers=sorted(answers_data, key=lambda x: x['order']),
+                         leaderboard_available=True)
+
 @app.route('/answers/<token>')
 def view_guest_answers(token):
-    """View guest's answers via QR code"""
+    """View guest's answers via QR code.
+
+    Answers can't change after submission, so the rendered page is cached
+    by token (until question wording changes) and phones may keep it too.
+    """
     try:
-        guest = db.get_guest_by_token(token)
+        version = db.get_questions_version()
+        cached = answer_pages.get(token, version)
 
-        if not guest:
-            return "Guest not found", 404
+        if cached is None:
+            guest = db.get_guest_by_token(token)
 
-        responses = db.get_guest_responses(guest['id'])
-        questions = db.get_questions()
+            # Tokens can be pre-assigned, so only show answers once submitted
+            if not guest or not guest['has_submitted']:
+                return "Guest not found", 404
 
-        # Create a mapping of question_id to question
-        questions_map = {q['id']: q for q in questions}
-
-        # Get short labels from config since database might not have the column
-        config_short_labels = {q['order']: q.get('short_label', '') for q in Config.QUESTIONS}
-
-        # Combine responses with questions
-        answers_data = []
-        for response in responses:
-            question = questions_map.get(response['question_id'])
-            if question:
-                # Get short_label from config as fallback
-                short_label = config_short_labels.get(question['order_index'], '') or question['question_text']
-
-                # Format answer based on type
-                answer_val = response['answer']
-                if question['question_type'] == 'time':
-                    # Convert minutes back to HH:MM format
-                    try:
-                        total_minutes = int(float(answer_val))
-                        hours = total_minutes // 60
-                        minutes = total_minutes % 60
-                        answer_val = f"{hours:02d}:{minutes:02d}"
-                    except (ValueError, TypeError):
-                        pass
-                else:
-                    # Remove decimal for integers
-                    try:
-                        answer_val = int(float(answer_val))
-                    except (ValueError, TypeError):
-                        pass
-
-                answers_data.append({
-                    'question': question['question_text'],
-                    'short_label': short_label,
-                    'answer': answer_val,
-                    'unit': question['unit'],
-                    'type': question['question_type'],
-                    'order': question['order_index']
-                })
+            cached = answer_pages.put(token, version, render_guest_answers(guest))
 
-        return render_template('guest_answers.html',
-                             guest=guest,
-                             answers=sorted(answers_data, key=lambda x: x['order']),
-                             leaderboard_available=True)
+        body, etag = cached
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            response = Response(body, mimetype='text/html')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = Config.ANSWER_PAGE_MAX_AGE
+        return response
     except Exception as e:
         print(f"Error in view_guest_answers: {e}")
         import traceback
@@ -650,16 +783,8 @@ def admin_dashboard():
 @app.route('/admin/qr-code')
 def admin_qr_code():
     """Generate QR code for admin login page (for phone access)"""
-    from flask import Response
     admin_url = f"{Config.BASE_URL}/admin/login"
-    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
-    qr.add_data(admin_url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buf = BytesIO()
-    img.save(buf, format='PNG')
-    buf.seek(0)
-    return Response(buf.getvalue(), mimetype='image/png')
+    return Response(qr_render.admin_qr_png(admin_url), mimetype='image/png')
 
 @app.route('/admin/update-answer', methods=['POST'])
 @admin_required
@@ -673,6 +798,8 @@ def admin_update_answer():
         return jsonify({'error': 'Invalid question ID'}), 400
 
     db.update_actual_answer(question_id, actual_answer)
+    scoring.invalidate()
+    live_updates.publish()
 
     return jsonify({
         'success': True,
@@ -680,6 +807,42 @@ def admin_update_answer():
         'actual_answer': actual_answer
     })
 
+@app.route('/admin/update-answers', methods=['POST'])
+@admin_required
+def admin_update_answers():
+    """Update several actual answers at once ({"answers": {question_id: answer}})"""
+    data = request.get_json(silent=True) or {}
+    answers = data.get('answers')
+
+    if not isinstance(answers, dict) or not answers:
+        return jsonify({'error': 'No answers provided'}), 400
+
+    try:
+        answers = {int(question_id): answer for question_id, answer in answers.items()}
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid question ID'}), 400
+
+    db.update_actual_answers(answers)
+    scoring.invalidate()
+    live_updates.publish()
+
+    return jsonify({
+        'success': True,
+        'updated': len(answers)
+    })
+
+def get_scoring_rule():
+    """Scoring rule requested via ?rule=, falling back to the default (APE)"""
+    rule = request.args.get('rule', scoring.DEFAULT_RULE)
+    return rule if rule in scoring.RULES else scoring.DEFAULT_RULE
+
+def get_ranked_leaderboard(rule):
+    """Overall leaderboard for a scoring rule"""
+    if rule == scoring.DEFAULT_RULE:
+        # The materialized table already holds APE scores
+        return db.get_leaderboard()
+    return scoring.get_scoreboard().leaderboard(rule)
+
 @app.route('/admin/leaderboard')
 @admin_required
 def admin_leaderboard():
@@ -690,34 +853,37 @@ def admin_leaderboard():
     # Check if viewing a specific question
     question_id = request.args.get('question', type=int)
     selected_question = None
+    rule = get_scoring_rule()
 
     if question_id:
         # Get per-question leaderboard
         selected_question = db.get_question_by_id(question_id)
         if selected_question and selected_question.get('actual_answer') is not None:
-            leaderboard = db.get_question_leaderboard(question_id)
+            leaderboard = scoring.get_scoreboard().question_leaderboard(question_id)
         else:
             leaderboard = []
     else:
         # Get overall leaderboard
-        leaderboard = db.get_leaderboard()
+        leaderboard = get_ranked_leaderboard(rule)
 
     return render_template('leaderboard.html',
                          leaderboard=leaderboard,
                          submission_count=submission_count,
                          questions=questions,
-                         selected_question=selected_question)
+                         selected_question=selected_question,
+                         rules=scoring.RULES,
+                         selected_rule=rule)
 
 @app.route('/api/admin/leaderboard')
 @admin_required
 def api_admin_leaderboard():
     """API endpoint for leaderboard data"""
-    leaderboard = db.get_leaderboard()
-    submission_count = db.get_submission_count()
+    rule = get_scoring_rule()
 
-    return jsonify({
-        'leaderboard': leaderboard,
-        'submission_count': submission_count
+    return conditional_json(lambda: {
+        'leaderboard': get_ranked_leaderboard(rule),
+        'submission_count': db.get_submission_count(),
+        'rule': rule
     })
 
 @app.route('/admin/responses')
@@ -725,10 +891,7 @@ def api_admin_leaderboard():
 def admin_responses():
     """View all responses"""
     questions = db.get_questions()
-    all_responses = {}
-
-    for question in questions:
-        all_responses[question['id']] = db.get_all_responses_by_question(question['id'])
+    all_responses = db.get_responses_by_question([question['id'] for question in questions])
 
     return render_template('admin_responses.html',
                          questions=questions,
@@ -745,32 +908,45 @@ def admin_guests():
 @admin_required
 def api_admin_guest_answers(guest_id):
     """Return a submitted guest's answers for the admin QR modal"""
-    responses = db.get_guest_responses(guest_id)
-    questions = db.get_questions()
-    questions_map = {q['id']: q for q in questions}
-    answers = []
-    for resp in responses:
-        q = questions_map.get(resp['question_id'])
-        if q:
-            if q['question_type'] == 'time':
-                try:
-                    total_minutes = int(float(resp['answer']))
-                    answer_str = f"{total_minutes // 60:02d}:{total_minutes % 60:02d}"
-                except (ValueError, TypeError):
-                    answer_str = resp['answer']
-            else:
-                try:
-                    answer_str = str(int(float(resp['answer'])))
-                except (ValueError, TypeError):
-                    answer_str = resp['answer']
-            answers.append({
-                'label': q.get('short_label') or q['question_text'],
-                'answer': answer_str,
-                'unit': q['unit'],
-                'type': q['question_type'],
-                'order': q['order_index']
-            })
-    return jsonify(sorted(answers, key=lambda x: x['order']))
+    def build():
+        responses = db.get_guest_responses(guest_id)
+        registry = db.get_question_registry()
+        answers = []
+        for resp in responses:
+            q = registry.get(resp['question_id'])
+            if q:
+                answers.append({
+                    'label': q.get('short_label') or q['question_text'],
+                    'answer': resp['answer_display'],
+                    'unit': resp['answer_unit'],
+                    'type': q['question_type'],
+                    'order': q['order_index']
+                })
+        return sorted(answers, key=lambda x: x['order'])
+
+    return conditional_json(build)
+
+def load_live_stats():
+    """Stats pushed to admin screens: submission count and APE leaderboard"""
+    return {
+        'submission_count': db.get_submission_count(),
+        'leaderboard': db.get_leaderboard()
+    }
+
+live_updates = LiveUpdates(load_live_stats, keepalive=Config.LIVE_KEEPALIVE_SECONDS,
+                           max_subscribers=Config.LIVE_MAX_STREAMS)
+
+@app.route('/admin/stream')
+@admin_required
+def admin_stream():
+    """Server-Sent Events: current stats on connect, then deltas as they change"""
+    if not live_updates.has_room():
+        # The page keeps working without live updates; EventSource gives up on a 503
+        return Response('Too many live screens open', status=503, headers={'Retry-After': '30'})
+    return Response(live_updates.stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @app.route('/admin/stats')
 @admin_required
@@ -783,6 +959,32 @@ def admin_stats():
                          submission_count=submission_count,
                          leaderboard=leaderboard)
 
+@app.route('/admin/metrics')
+@admin_required
+def admin_metrics():
+    """Request, SQL and QR render timings since the server started"""
+    snapshot = metrics.snapshot()
+    routes = [dict(timing, endpoint=endpoint,
+                   queries=snapshot['request_queries'][endpoint]['mean'],
+                   query_ms=snapshot['request_query_time'][endpoint]['mean'])
+              for endpoint, timing in snapshot['request'].items()]
+
+    return render_template('admin_metrics.html',
+                         enabled=metrics.enabled,
+                         uptime_minutes=int((time.time() - metrics.started) / 60),
+                         routes=routes,
+                         statements=list(snapshot['query'].items())[:25],
+                         qr_render=snapshot['qr_render'],
+                         query_debug=metrics.query_debug,
+                         slow_query_ms=Config.SLOW_QUERY_MS,
+                         slow_queries=list(reversed(metrics.slow_queries)))
+
+@app.route('/admin/metrics/prometheus')
+@admin_required
+def admin_metrics_prometheus():
+    """The same histograms in Prometheus' text format"""
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
 # ============================================================================
 # ERROR HANDLERS
 # ============================================================================
@@ -800,6 +1002,37 @@ def server_error(error):
 # ============================================================================
 
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Run The Hancox Wedding Sweepstake server')
+    parser.add_argument('--pregenerate-qr', action='store_true',
+                        help='assign tokens and render every guest QR code before serving')
+    parser.add_argument('--force', action='store_true',
+                        help='with --pregenerate-qr, re-render every QR code, even ones already up to date')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes to pre-generate QR codes with (default: all cores)')
+    parser.add_argument('--production', action='store_true',
+                        help='serve on a fixed pool of threads instead of the development server')
+    parser.add_argument('--threads', type=int, default=Config.SERVER_THREADS,
+                        help=f'request threads with --production (default: {Config.SERVER_THREADS})')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print an import-time breakdown and time-to-first-response, then exit')
+    parser.add_argument('--debug-queries', action='store_true',
+                        help='warn about requests that run too many (or repeated) SQL statements '
+                             'and log slow queries with their query plans')
+    args = parser.parse_args()
+
+    if args.debug_queries:
+        metrics.enabled = metrics.query_debug = True
+
+    if args.profile_startup:
+        from startup_profile import profile_startup
+        profile_startup()
+        raise SystemExit(0)
+
+    init_app_data()
+    if args.pregenerate_qr:
+        pregenerate_guest_qr_codes(workers=args.workers, force=args.force)
+
     print("=" * 60)
     print("The Hancox Wedding Sweepstake - Server Starting")
     print("=" * 60)
@@ -810,8 +1043,16 @@ if __name__ == '__main__':
     print(f"Server: http://{Config.HOST}:{Config.PORT}")
     print("=" * 60)
 
-    app.run(
-        host=Config.HOST,
-        port=Config.PORT,
-        debug=Config.DEBUG
-    )
+    if args.production:
+        from server import serve
+        try:
+            serve(app, Config.HOST, Config.PORT, threads=max(1, args.threads), streams=[live_updates])
+        finally:
+            qr_renderer.shutdown(wait=False)
+            db.close_all_connections()
+    else:
+        app.run(
+            host=Config.HOST,
+            port=Config.PORT,
+            debug=Config.DEBUG
+        )
@@ -0,0 +1,253 @@
+"""Micro-benchmarks for database.py on synthetic events of growing size.
+
+    python bench_db.py --sizes 100 1000 10000
+
+For each size a synthetic event is generated (guest list, questions and
+answers drawn from a chosen distribution) in a scratch folder, and each
+database.py operation is timed on its own. Every size runs in a fresh
+child interpreter, so module caches (search index, question registry,
+pooled connections) from one size never leak into the next.
+
+The report gives median/p95 per call at each size plus a scaling exponent
+between consecutive sizes: ~0 means constant, ~1 linear, ~2 quadratic.
+Results are printed and saved as JSON to compare changes against.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+FIRST_NAMES = ['Amy', 'Adele', 'Alasdair', 'Ben', 'Chloé', 'Dan', 'Emma', 'Fran', 'George', 'Hannah',
+               'Heather', 'Isla', 'Jack', 'Jane', 'Liam', 'Mohammed', 'Niamh', 'Oliver', 'Pete',
+               'Siobhán', 'Tom', 'Zoë']
+LAST_SYLLABLES = ['al', 'bry', 'cox', 'den', 'ell', 'for', 'gan', 'han', 'ing', 'ley', 'mor',
+                  'ner', 'op', 'ram', 'son', 'ton', 'war', 'by']
+
+DISTRIBUTIONS = ('normal', 'uniform', 'clustered')
+
+# ============================================================================
+# SYNTHETIC EVENT
+# ============================================================================
+
+def _minutes(value):
+    """A config min/max as a number (times "HH:MM" become minutes)"""
+    if isinstance(value, str) and ':' in value:
+        hours, minutes = value.split(':')
+        return int(hours) * 60 + int(minutes)
+    return float(value)
+
+def generate_questions(count, templates):
+    """`count` questions modelled on the configured ones (cycled, renumbered)"""
+    questions = []
+    for i in range(count):
+        question = dict(templates[i % len(templates)])
+        question['order'] = i + 1
+        if i >= len(templates):
+            question['text'] = f"{question['text']} (#{i + 1})"
+            question['short_label'] = f"{question.get('short_label', 'Question')} {i + 1}"
+        questions.append(question)
+    return questions
+
+def generate_guests(count, rng):
+    """`count` unique (first_name, last_name) pairs"""
+    guests, seen = [], set()
+    while len(guests) < count:
+        first = rng.choice(FIRST_NAMES)
+        last = ''.join(rng.choice(LAST_SYLLABLES) for _ in range(rng.randint(2, 3))).title()
+        if (first, last) not in seen:
+            seen.add((first, last))
+            guests.append((first, last))
+    return guests
+
+def generate_answer(question, distribution, rng):
+    """A raw answer (as the kiosk sends it) for `question`"""
+    low, high = _minutes(question['min']), _minutes(question['max'])
+    if distribution == 'uniform':
+        value = rng.uniform(low, high)
+    elif distribution == 'clustered':
+        # A handful of popular guesses — lots of ties on the leaderboards
+        value = low + (high - low) * rng.choice([0.25, 0.5, 0.5, 0.75])
+    else:
+        value = min(high, max(low, rng.gauss((low + high) / 2, (high - low) / 6)))
+
+    if question['type'] == 'time':
+        value = int(round(value))
+        return f"{value // 60:02d}:{value % 60:02d}"
+    return str(int(round(value)))
+
+def write_guest_csv(path, guests):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['first_name', 'last_name'])
+        writer.writerows(guests)
+
+# ============================================================================
+# TIMING (runs in the child process for one size)
+# ============================================================================
+
+def _stats(times):
+    times = sorted(times)
+    return {
+        'calls': len(times),
+        'median_ms': round(times[len(times) // 2] * 1000, 4),
+        'p95_ms': round(times[max(0, math.ceil(len(times) * 0.95) - 1)] * 1000, 4),
+        'mean_ms': round(sum(times) / len(times) * 1000, 4),
+        'min_ms': round(times[0] * 1000, 4)
+    }
+
+def _time(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def bench_size(size, question_count, distribution, submitted, repeat, seed):
+    """Build a `size`-guest event in a scratch folder and time each operation"""
+    from config import Config
+
+    rng = random.Random(seed)
+    scratch = tempfile.mkdtemp(prefix='wedding-bench-')
+    Config.DATABASE_PATH = os.path.join(scratch, 'wedding.db')
+    Config.QUESTIONS = generate_questions(question_count, Config.QUESTIONS)
+    csv_path = os.path.join(scratch, 'guests.csv')
+    guests = generate_guests(size + 1, rng)
+    write_guest_csv(csv_path, guests[:size])
+
+    import database as db
+
+    results = {}
+    try:
+        db.init_db()
+
+        # Guest list import (what load_guests_from_csv used to do)
+        results['sync_data (first import)'] = _stats([_time(db.sync_data, csv_path)])
+        results['sync_data (unchanged)'] = _stats([_time(db.sync_data, csv_path) for _ in range(repeat)])
+        write_guest_csv(csv_path, guests)
+        results['sync_data (one guest added)'] = _stats([_time(db.sync_data, csv_path)])
+
+        questions = db.get_questions()
+        all_guests = db.get_all_guests()
+        submitting = rng.sample(all_guests, int(len(all_guests) * submitted))
+
+        times = []
+        for guest in submitting:
+            answers = {str(q['id']): generate_answer(Config.QUESTIONS[q['order_index'] - 1], distribution, rng)
+                       for q in questions}
+            token = f"bench{guest['id']}"
+            times.append(_time(db.submit_guest_answers, guest['id'], answers, f"qr_codes/{token}.png", token))
+        results['submit_guest_answers'] = _stats(times)
+
+        actual = {q['id']: _minutes(Config.QUESTIONS[q['order_index'] - 1]['min']) for q in questions}
+        results['update_actual_answers (all)'] = _stats([_time(db.update_actual_answers, actual)])
+        results['update_actual_answer (one)'] = _stats(
+            [_time(db.update_actual_answer, questions[i % len(questions)]['id'], actual[questions[i % len(questions)]['id']])
+             for i in range(repeat)])
+
+        # Searches: from a cold index (sync_data has already built one, so it
+        # is dropped before each call); then prefixes as typed, full names and
+        # a typo against the warm index
+        times = []
+        for _ in range(repeat):
+            db._guest_index = None
+            times.append(_time(db.search_guests, 'a'))
+        results['search_guests (builds index)'] = _stats(times)
+        queries = []
+        for first, last in rng.sample(guests, min(repeat, len(guests))):
+            full = f"{first} {last}"
+            queries += [full[:1], full[:3], full, full[:-2] + full[-1]]
+        results['search_guests'] = _stats([_time(db.search_guests, query) for query in queries])
+
+        results['get_leaderboard'] = _stats([_time(db.get_leaderboard) for _ in range(repeat)])
+        question_ids = [q['id'] for q in questions]
+        results['get_responses_by_question'] = _stats(
+            [_time(db.get_responses_by_question, question_ids) for _ in range(repeat)])
+        sample = [guest['id'] for guest in rng.sample(submitting or all_guests, min(repeat, len(submitting or all_guests)))]
+        results['get_guest_responses'] = _stats([_time(db.get_guest_responses, guest_id) for guest_id in sample])
+        results['get_submission_count'] = _stats([_time(db.get_submission_count) for _ in range(repeat)])
+    finally:
+        db.close_all_connections()
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def scaling(by_size):
+    """Scaling exponent of each operation's median between consecutive sizes"""
+    sizes = sorted(by_size)
+    exponents = {}
+    for small, large in zip(sizes, sizes[1:]):
+        for op, stats in by_size[large].items():
+            before = by_size[small].get(op)
+            if before and before['median_ms'] > 0 and stats['median_ms'] > 0:
+                exponent = math.log(stats['median_ms'] / before['median_ms']) / math.log(large / small)
+                exponents.setdefault(op, {})[f'{small}->{large}'] = round(exponent, 2)
+    return exponents
+
+def print_report(report):
+    sizes = sorted(report['sizes'], key=int)
+    ops = list(report['sizes'][sizes[0]])
+    width = max(len(op) for op in ops) + 2
+    print("=" * (width + 14 * len(sizes) + 12))
+    print(f"{'Median ms per call':<{width}}" + ''.join(f"{size + ' guests':>14}" for size in sizes) + f"{'Scaling':>12}")
+    print("-" * (width + 14 * len(sizes) + 12))
+    for op in ops:
+        row = ''.join(f"{report['sizes'][size][op]['median_ms']:>14.3f}" for size in sizes)
+        exponents = list(report['scaling'].get(op, {}).values())
+        print(f"{op:<{width}}{row}{(f'n^{exponents[-1]:.2f}' if exponents else ''):>12}")
+    print("=" * (width + 14 * len(sizes) + 12))
+    print("Scaling: exponent between the two largest sizes (~1 linear, ~2 quadratic)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark database.py on synthetic events')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='guest counts to benchmark (default: 100 1000 10000)')
+    parser.add_argument('--questions', type=int, default=4, help='questions per event (default: 4)')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='normal',
+                        help='how answers are spread over each question\'s range (default: normal)')
+    parser.add_argument('--submitted', type=float, default=0.8,
+                        help='fraction of guests who submit (default: 0.8)')
+    parser.add_argument('--repeat', type=int, default=50, help='calls timed per operation (default: 50)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', default='bench_results.json', help='where to write the JSON report')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        results = bench_size(args.child, args.questions, args.distribution, args.submitted, args.repeat, args.seed)
+        print(json.dumps(results))
+        return
+
+    by_size = {}
+    for size in args.sizes:
+        print(f"Benchmarking {size} guests...")
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', str(size),
+             '--questions', str(args.questions), '--distribution', args.distribution,
+             '--submitted', str(args.submitted), '--repeat', str(args.repeat), '--seed', str(args.seed)],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        if result.returncode != 0:
+            raise SystemExit(f"Benchmark at {size} guests failed:\n{result.stderr}")
+        by_size[size] = json.loads(result.stdout.strip().splitlines()[-1])
+
+    report = {
+        'settings': {'questions': args.questions, 'distribution': args.distribution,
+                     'submitted': args.submitted, 'repeat': args.repeat, 'seed': args.seed},
+        'sizes': {str(size): results for size, results in by_size.items()},
+        'scaling': scaling(by_size)
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"Results written to {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Build the service worker's precache manifest from the static/ tree.
+
+    python build_assets.py
+
+Writes static/precache-manifest.json: every asset the kiosk pages load,
+keyed by URL, with a short content hash. Pages link to assets as
+/static/...?v=<hash>, so a changed file gets a new URL and the service
+worker can serve everything else cache-first. The app rebuilds the
+manifest itself when it's missing or older than an asset, so running this
+by hand is only needed to check what will be cached.
+"""
+import hashlib
+import json
+import os
+import re
+
+STATIC_DIR = 'static'
+MANIFEST_PATH = os.path.join(STATIC_DIR, 'precache-manifest.json')
+
+ASSET_EXTENSIONS = {'.css', '.js', '.json', '.png', '.jpg', '.jpeg', '.svg', '.ico', '.webp'}
+FONT_EXTENSIONS = {'.ttf', '.otf', '.woff', '.woff2'}
+SKIP = {'sw.js', 'precache-manifest.json'}
+SKIP_DIRS = {'qr_codes'}  # Per-guest, generated at runtime
+
+_CSS_URL = re.compile(r"""url\(\s*['"]?(/static/[^'")]+)['"]?\s*\)""")
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:10]
+
+def _static_url(path):
+    return '/' + path.replace(os.sep, '/')
+
+def list_assets(static_dir=STATIC_DIR):
+    """Paths of the files to precache.
+
+    Fonts are only included when a stylesheet uses them — the bundled font
+    families ship many weights the pages never load.
+    """
+    files, fonts, stylesheets = [], [], []
+    for root, dirs, names in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(names):
+            ext = os.path.splitext(name)[1].lower()
+            path = os.path.join(root, name)
+            if name in SKIP:
+                continue
+            if ext in FONT_EXTENSIONS:
+                fonts.append(path)
+            elif ext in ASSET_EXTENSIONS:
+                files.append(path)
+                if ext == '.css':
+                    stylesheets.append(path)
+
+    used = set()
+    for path in stylesheets:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            used.update(_CSS_URL.findall(f.read()))
+    return files + [path for path in fonts if _static_url(path) in used]
+
+def build_manifest(static_dir=STATIC_DIR, manifest_path=MANIFEST_PATH):
+    """Hash the assets and write the manifest; returns it as a dict"""
+    assets = {_static_url(path): _file_hash(path) for path in list_assets(static_dir)}
+    version = hashlib.sha256(json.dumps(assets, sort_keys=True).encode()).hexdigest()[:12]
+    manifest = {'version': version, 'assets': assets}
+
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+def load_manifest(static_dir=STATIC_DIR, manifest_path=MANIFEST_PATH):
+    """Read the manifest, rebuilding it if it's missing or out of date"""
+    try:
+        built = os.path.getmtime(manifest_path)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return build_manifest(static_dir, manifest_path)
+
+    assets = list_assets(static_dir)
+    if (len(assets) != len(manifest['assets'])
+            or any(_static_url(path) not in manifest['assets'] or os.path.getmtime(path) > built
+                   for path in assets)):
+        return build_manifest(static_dir, manifest_path)
+    return manifest
+
+if __name__ == '__main__':
+    manifest = build_manifest()
+    total = sum(os.path.getsize(url.lstrip('/')) for url in manifest['assets'])
+    print(f"Wrote {MANIFEST_PATH}: {len(manifest['assets'])} assets, "
+          f"{total / 1024 / 1024:.1f} MB, version {manifest['version']}")
@@ -1,31 +1,81 @@
 import os
 import socket
+from functools import lru_cache
 
+@lru_cache(maxsize=None)
 def get_local_ip():
-    """Get the local IP address of this machine"""
-    try:
-        # Create a socket to determine the local IP
+    """Get the local IP address of this machine (looked up once, then cached)"""
+    if os.environ.get('LOCAL_IP'):
+        return os.environ['LOCAL_IP']
+
+    # "Connecting" a UDP socket sends nothing; it just asks the OS which
+    # interface it would use. A private-range target first, so this works on
+    # venue Wi-Fi with no internet route; a public one as a fallback.
+    for target in ("10.255.255.255", "8.8.8.8"):
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
-        s.close()
-        return ip
-    except Exception:
-        return "localhost"
+        try:
+            s.connect((target, 1))
+            ip = s.getsockname()[0]
+            if not ip.startswith('127.') and ip != '0.0.0.0':
+                return ip
+        except OSError:
+            pass
+        finally:
+            s.close()
+
+    try:
+        ip = socket.gethostbyname(socket.gethostname())
+        if not ip.startswith('127.'):
+            return ip
+    except OSError:
+        pass
+    return "localhost"
+
+class _LazyClassAttribute:
+    """Class attribute computed on first access (so importing config is cheap)"""
+
+    def __init__(self, func):
+        self.func = func
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        value = self.func(owner)
+        setattr(owner, self.name, value)  # Replace the descriptor with the value
+        return value
 
 class Config:
     # Flask settings
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'wedding-game-secret-key-change-this'
     DATABASE_PATH = 'data/wedding.db'
 
+    # Database connection tuning
+    DB_POOL_SIZE = 8                    # Idle connections kept open for reuse
+    DB_BUSY_TIMEOUT_MS = 5000           # Wait this long on a locked database
+    DB_CACHE_SIZE_KB = 8192             # Page cache per connection
+    DB_MMAP_SIZE = 64 * 1024 * 1024     # Memory-mapped I/O for reads
+    DB_STATEMENT_CACHE_SIZE = 128       # Prepared statements kept per connection
+
     # Server settings
     HOST = '0.0.0.0'  # Accessible on local network
     PORT = 5000
     DEBUG = False  # Set to False for wedding day!
+    SERVER_THREADS = 16       # Requests handled at once with --production (up to LIVE_MAX_STREAMS go to live streams)
+    SERVER_IDLE_TIMEOUT = 5   # Seconds an idle keep-alive connection may hold a thread
 
     # Admin settings
     ADMIN_PASSWORD = '260411F&L'  # Change this before wedding!
     SESSION_TIMEOUT = 14400  # 4 hours in seconds
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND') or 'cookie'  # 'cookie': Flask's signed cookie; 'server': data in SQLite, cookie holds an ID
+    SESSION_CACHE_SIZE = 512    # Server sessions kept in memory (the rest are read from SQLite)
+    LIVE_KEEPALIVE_SECONDS = 15  # Ping idle live-update streams this often
+    LIVE_MAX_STREAMS = 4         # Admin screens with live updates at once (each holds a server thread)
+    METRICS_ENABLED = True       # Time requests, SQL statements and QR renders (see /admin/metrics)
+    QUERY_DEBUG = False          # Flag chatty requests and log slow queries (or run with --debug-queries)
+    QUERY_WARN_COUNT = 20        # Warn when one request runs more SQL statements than this
+    QUERY_WARN_REPEATS = 5       # ...or runs the same statement this many times (an N+1 loop)
+    SLOW_QUERY_MS = 50           # Log statements slower than this, with their EXPLAIN QUERY PLAN
 
     # Guest settings
     MAX_GUESTS = 100
@@ -33,9 +83,14 @@ class Config:
 
     # QR Code settings
     QR_CODE_DIR = 'static/qr_codes'
-    # Auto-detect local IP for QR codes so phones can access
-    LOCAL_IP = get_local_ip()
-    BASE_URL = f'http://{LOCAL_IP}:{PORT}'
+    QR_RENDER_WORKERS = 2  # Background threads rendering guest QR codes
+    QR_CACHE_SIZE = 256    # Rendered guest QR PNGs kept in memory
+    QR_WRITE_TO_DISK = True  # Also save PNGs under QR_CODE_DIR
+    ANSWER_PAGE_CACHE_SIZE = 1024  # Rendered /answers/<token> pages kept in memory
+    ANSWER_PAGE_MAX_AGE = 86400    # Seconds phones may reuse an answers page without asking
+    # Auto-detect local IP for QR codes so phones can access (on first use)
+    LOCAL_IP = _LazyClassAttribute(lambda cls: get_local_ip())
+    BASE_URL = _LazyClassAttribute(lambda cls: f'http://{cls.LOCAL_IP}:{cls.PORT}')
 
     # Questions — 4 questions on a 2x2 grid for fast throughput
     # short_label is used on mobile for compact display
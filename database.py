@@ -1,20 +1,244 @@
 import sqlite3
 import csv
+import hashlib
+import io
+import json
 import os
+import queue
+import secrets
+import threading
+import time
 from datetime import datetime
 from config import Config
+from metrics import metrics
+from guest_search import GuestIndex
+import answer_codec
+from question_registry import QuestionRegistry
 
 # Global database connection
 DB_PATH = Config.DATABASE_PATH
 
-def get_db_connection():
-    """Get a database connection"""
-    conn = sqlite3.connect(DB_PATH)
+# Connection pool — connections are opened once, tuned, and reused across
+# requests instead of paying connect + pragma setup on every call
+_pool = queue.LifoQueue(maxsize=Config.DB_POOL_SIZE)
+
+# Data version — bumped by every commit that changes a row, so read-only
+# endpoints can tell whether anything changed without querying. The boot ID
+# keeps versions from a previous run from ever matching.
+_BOOT_ID = secrets.token_hex(4)
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+def _bump_data_version():
+    """Bump the version by hand, for writes committed with versioned=False
+    that must first bring in-memory caches (search index, registry) up to
+    date, so a response built in between isn't cached under the new ETag"""
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+
+def get_data_version():
+    """Opaque string that changes whenever the database contents do (for ETags)"""
+    return f'{_BOOT_ID}-{_data_version}'
+
+# Bumped when question wording, units or order change (see sync_data), for
+# caches of pages that only show question metadata, not actual answers
+_questions_version = 0
+
+def get_questions_version():
+    return _questions_version
+
+class PooledConnection:
+    """Thin wrapper around a pooled sqlite3 connection.
+
+    Behaves like a normal connection, except close() hands it back to the
+    pool (rolling back anything left uncommitted) rather than closing it,
+    and commits that changed anything bump the data version.
+    """
+
+    def __init__(self, conn, path):
+        self._conn = conn
+        self._changes = conn.total_changes
+        self.path = path
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+        return TimedCursor(cursor) if metrics.enabled else cursor
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        result = self._conn.__exit__(*exc)
+        self._note_changes()
+        return result
+
+    def commit(self, versioned=True):
+        """Commit; versioned=False is for bookkeeping writes (e.g. sessions)
+        that no cached response depends on, so they don't bump the version"""
+        self._conn.commit()
+        if versioned:
+            self._note_changes()
+        else:
+            self._changes = self._conn.total_changes
+
+    def _note_changes(self):
+        if self._conn.total_changes != self._changes:
+            self._changes = self._conn.total_changes
+            _bump_data_version()
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            if self.path == DB_PATH:
+                _pool.put_nowait(PooledConnection(conn, self.path))
+                return
+        except (queue.Full, sqlite3.Error):
+            pass
+        conn.close()
+
+class TimedCursor:
+    """sqlite3 cursor that records how long each statement takes (see metrics.py).
+
+    SQLite produces rows as they're fetched, so for queries the time spent
+    fetching the results counts towards the statement too.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._pending = None    # [sql, elapsed ms, params] of a query whose rows aren't fetched yet
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._pending[1] += (time.perf_counter() - start) * 1000
+
+    def _flush(self):
+        if self._pending is not None:
+            sql, elapsed_ms, params = self._pending
+            self._pending = None
+            metrics.record_query(sql, elapsed_ms)
+            if metrics.query_debug and elapsed_ms >= Config.SLOW_QUERY_MS:
+                metrics.slow_query(sql, elapsed_ms, _query_plan(self._cursor.connection, sql, params))
+
+    def execute(self, sql, params=()):
+        self._flush()
+        self._pending = [sql, 0.0, params]
+        try:
+            self._timed(self._cursor.execute, sql, params)
+        finally:
+            if self._cursor.description is None:
+                self._flush()   # No rows to fetch
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._flush()
+        self._pending = [sql, 0.0, None]   # Too many parameter sets to explain
+        try:
+            self._timed(self._cursor.executemany, sql, seq_of_params)
+        finally:
+            self._flush()
+        return self
+
+    def fetchone(self):
+        if self._pending is None:
+            return self._cursor.fetchone()
+        row = self._timed(self._cursor.fetchone)
+        self._flush()
+        return row
+
+    def fetchall(self):
+        if self._pending is None:
+            return self._cursor.fetchall()
+        rows = self._timed(self._cursor.fetchall)
+        self._flush()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self._timed(self._cursor.fetchone) if self._pending else self._cursor.fetchone()
+            if row is None:
+                self._flush()
+                return
+            yield row
+
+    def close(self):
+        self._flush()
+        self._cursor.close()
+
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+def _query_plan(conn, sql, params):
+    """EXPLAIN QUERY PLAN for a statement, as indented lines ([] if it has none)"""
+    if params is None or not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    try:
+        rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    except sqlite3.Error:
+        return []
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+def _open_connection():
+    """Open and tune a new SQLite connection"""
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=Config.DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=Config.DB_STATEMENT_CACHE_SIZE
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')  # Safe with WAL, avoids an fsync per commit
+    conn.execute(f'PRAGMA cache_size = -{int(Config.DB_CACHE_SIZE_KB)}')
+    conn.execute(f'PRAGMA mmap_size = {int(Config.DB_MMAP_SIZE)}')
+    conn.execute(f'PRAGMA busy_timeout = {int(Config.DB_BUSY_TIMEOUT_MS)}')
+    conn.execute('PRAGMA temp_store = MEMORY')
     return conn
 
+def get_db_connection():
+    """Get a database connection from the pool (call close() to return it)"""
+    while True:
+        try:
+            pooled = _pool.get_nowait()
+        except queue.Empty:
+            return PooledConnection(_open_connection(), DB_PATH)
+        if pooled.path == DB_PATH:
+            return pooled
+        # DB_PATH changed since this connection was pooled — discard it
+        pooled._conn.close()
+
+def close_all_connections():
+    """Close every pooled connection (e.g. before swapping DB_PATH or exiting)"""
+    while True:
+        try:
+            pooled = _pool.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            pooled._conn.execute('PRAGMA optimize')  # Recommended before closing
+        except sqlite3.Error:
+            pass
+        pooled._conn.close()
+
 def init_db():
-    """Initialize the database with all tables"""
+    """Create any missing tables, then bring the schema up to date (see MIGRATIONS)"""
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -48,12 +272,6 @@ def init_db():
         )
     ''')
 
-    # Migration: add short_label column if missing (for existing databases)
-    try:
-        cursor.execute('SELECT short_label FROM questions LIMIT 1')
-    except Exception:
-        cursor.execute('ALTER TABLE questions ADD COLUMN short_label TEXT')
-
     # Create responses table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS responses (
@@ -61,6 +279,8 @@ def init_db():
             guest_id INTEGER NOT NULL,
             question_id INTEGER NOT NULL,
             answer REAL NOT NULL,
+            answer_display TEXT,
+            answer_unit TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (guest_id) REFERENCES guests(id),
             FOREIGN KEY (question_id) REFERENCES questions(id),
@@ -68,6 +288,36 @@ def init_db():
         )
     ''')
 
+    # Materialized leaderboard — kept up to date by submit_guest_answers and
+    # update_actual_answer so reads never have to recompute scores
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leaderboard_scores (
+            guest_id INTEGER PRIMARY KEY,
+            full_name TEXT NOT NULL,
+            submission_time TIMESTAMP,
+            score REAL NOT NULL,
+            FOREIGN KEY (guest_id) REFERENCES guests(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_leaderboard_scores_rank
+        ON leaderboard_scores (score, submission_time, guest_id)
+    ''')
+
+    # QR render jobs — submissions return before their QR image exists, so
+    # track each render here (and resume unfinished ones after a restart)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS qr_jobs (
+            token TEXT PRIMARY KEY,
+            guest_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+
     # Create admin_config table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS admin_config (
@@ -76,61 +326,292 @@ def init_db():
         )
     ''')
 
+    _create_sessions_table(cursor)
+
     conn.commit()
-    conn.close()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
 
-def load_guests_from_csv(csv_path):
-    """Load guests from CSV file into database"""
-    if not os.path.exists(csv_path):
-        print(f"Warning: {csv_path} not found. Please create it with first_name and last_name columns.")
-        return
+def _create_sessions_table(cursor):
+    # Server-side sessions (see session_store.py); the cookie holds only the ID
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            sid TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def _encode_responses(cursor, where_sql='1', params=()):
+    """Recompute the stored display string and unit of the matching responses"""
+    cursor.execute(f'''
+        SELECT r.id, r.answer, q.question_type, q.unit
+        FROM responses r
+        JOIN questions q ON r.question_id = q.id
+        WHERE {where_sql}
+    ''', params)
+    rows = [(answer_codec.format_value(row['answer'], row['question_type']),
+             answer_codec.display_unit(row['question_type'], row['unit']), row['id'])
+            for row in cursor.fetchall()]
+    cursor.executemany('UPDATE responses SET answer_display = ?, answer_unit = ? WHERE id = ?', rows)
+
+# ============================================================================
+# SCHEMA MIGRATIONS
+# ============================================================================
+# Each migration moves the schema up one version and runs once per database;
+# the version reached is kept in PRAGMA user_version. init_db() creates
+# missing tables in their current shape first, so a migration must also cope
+# with a schema that already has its change (IF NOT EXISTS, _add_column).
+# Only ever append to MIGRATIONS — never edit or reorder a released one.
+
+def _add_column(cursor, table, column, definition):
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in {row['name'] for row in cursor.fetchall()}:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def _migrate_short_label(cursor):
+    _add_column(cursor, 'questions', 'short_label', 'TEXT')
 
-    # Clear existing guests
-    cursor.execute('DELETE FROM guests')
+def _migrate_answer_display(cursor):
+    # Each answer's display string and unit are stored alongside it (see
+    # answer_codec.py) so pages don't format answers on every read
+    _add_column(cursor, 'responses', 'answer_display', 'TEXT')
+    _add_column(cursor, 'responses', 'answer_unit', 'TEXT')
+    _encode_responses(cursor, 'r.answer_display IS NULL')
 
+def _migrate_hot_query_indexes(cursor):
+    # Submitted-guest list (WHERE has_submitted = 1 ORDER BY first_name, last_name)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_guests_submitted_name
+        ON guests (has_submitted, first_name, last_name)
+    ''')
+    # Guest list, snapshot and CSV sync (ORDER BY / matched on full_name)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_guests_full_name ON guests (full_name)')
+    # Submission counts and submission-time ordering
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_guests_submitted_time
+        ON guests (has_submitted, submission_time)
+    ''')
+    # Per-question response lists and leaderboards (WHERE question_id = ? ORDER BY answer)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_responses_question_answer
+        ON responses (question_id, answer)
+    ''')
+
+MIGRATIONS = [
+    (1, 'questions.short_label', _migrate_short_label),
+    (2, 'responses.answer_display and answer_unit', _migrate_answer_display),
+    (3, 'indexes for the hot guest and response queries', _migrate_hot_query_indexes),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA user_version')
+    return cursor.fetchone()[0]
+
+def _backup_before_migrating(conn, version):
+    """Copy a database that already holds guests before changing its schema"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM guests)')
+    if not cursor.fetchone()[0]:
+        return None
+    path = f'{DB_PATH}.v{version}.bak'
+    backup = sqlite3.connect(path)
     try:
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                first_name = row.get('first_name', '').strip()
-                last_name = row.get('last_name', '').strip()
-                if first_name and last_name:
-                    full_name = f"{first_name} {last_name}"
-                    cursor.execute('''
-                        INSERT INTO guests (first_name, last_name, full_name)
-                        VALUES (?, ?, ?)
-                    ''', (first_name, last_name, full_name))
-        conn.commit()
-        print(f"Loaded guests from {csv_path}")
-    except Exception as e:
-        print(f"Error loading guests: {e}")
+        conn.backup(backup)
     finally:
-        conn.close()
+        backup.close()
+    return path
 
-def load_questions_from_config():
-    """Load questions from config into database"""
-    conn = get_db_connection()
+def migrate(conn):
+    """Apply pending migrations in order, each in its own transaction.
+
+    Existing data is backed up first. Afterwards the query planner's
+    statistics are refreshed (ANALYZE after a migration, PRAGMA optimize
+    always). Returns the number of migrations applied.
+    """
+    version = get_schema_version(conn)
+    if version > SCHEMA_VERSION:
+        print(f"Warning: database schema v{version} is newer than this code knows (v{SCHEMA_VERSION}); "
+              f"not migrating")
+        return 0
+
+    pending = [migration for migration in MIGRATIONS if migration[0] > version]
     cursor = conn.cursor()
+    if pending:
+        backup_path = _backup_before_migrating(conn, version)
+        if backup_path:
+            print(f"Backed up the database to {backup_path} before migrating")
 
-    # Clear existing questions
-    cursor.execute('DELETE FROM questions')
+    for target, description, upgrade in pending:
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            upgrade(cursor)
+            cursor.execute(f'PRAGMA user_version = {int(target)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Migrated database to schema v{target}: {description}")
 
-    try:
-        for q in Config.QUESTIONS:
-            cursor.execute('''
-                INSERT INTO questions (question_text, question_type, order_index, unit, short_label)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (q['text'], q['type'], q['order'], q['unit'], q.get('short_label', '')))
+    if pending:
+        cursor.execute('ANALYZE')
         conn.commit()
-        print(f"Loaded {len(Config.QUESTIONS)} questions from config")
+    cursor.execute('PRAGMA optimize')
+    return len(pending)
+
+def _fingerprint(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _get_setting(cursor, key):
+    cursor.execute('SELECT value FROM admin_config WHERE key = ?', (key,))
+    row = cursor.fetchone()
+    return row['value'] if row else None
+
+def _set_setting(cursor, key, value):
+    cursor.execute('INSERT OR REPLACE INTO admin_config (key, value) VALUES (?, ?)', (key, value))
+
+def _sync_questions(cursor):
+    """Upsert questions from Config.QUESTIONS, matched on order; returns True if changed"""
+    fingerprint = _fingerprint(json.dumps(Config.QUESTIONS, sort_keys=True).encode('utf-8'))
+    if _get_setting(cursor, 'questions_fingerprint') == fingerprint:
+        return False
+
+    cursor.execute('SELECT id, order_index FROM questions ORDER BY id')
+    existing = {}
+    for row in cursor.fetchall():
+        existing.setdefault(row['order_index'], row['id'])
+
+    updates, inserts = [], []
+    for q in Config.QUESTIONS:
+        values = (q['text'], q['type'], q['unit'], q.get('short_label', ''))
+        if q['order'] in existing:
+            updates.append(values + (existing[q['order']],))
+        else:
+            inserts.append(values + (q['order'],))
+
+    # Existing rows keep their IDs, actual answers and responses
+    cursor.executemany('''
+        UPDATE questions
+        SET question_text = ?, question_type = ?, unit = ?, short_label = ?, is_active = 1
+        WHERE id = ?
+    ''', updates)
+    cursor.executemany('''
+        INSERT INTO questions (question_text, question_type, unit, short_label, order_index)
+        VALUES (?, ?, ?, ?, ?)
+    ''', inserts)
+
+    # Questions dropped from the config are hidden rather than deleted
+    orders = [q['order'] for q in Config.QUESTIONS]
+    cursor.execute(f'''
+        UPDATE questions SET is_active = 0
+        WHERE order_index NOT IN ({', '.join('?' * len(orders))})
+    ''', orders)
+
+    # A question's type or unit may have changed, so re-render stored answers
+    _encode_responses(cursor)
+
+    _set_setting(cursor, 'questions_fingerprint', fingerprint)
+    print(f"Synced {len(Config.QUESTIONS)} questions from config "
+          f"({len(inserts)} new, {len(updates)} updated)")
+    return True
+
+def _sync_guests(cursor, csv_path):
+    """Diff the guest CSV against the guests table; returns True if changed"""
+    if not os.path.exists(csv_path):
+        print(f"Warning: {csv_path} not found. Please create it with first_name and last_name columns.")
+        return False
+
+    with open(csv_path, 'rb') as f:
+        data = f.read()
+    fingerprint = _fingerprint(data)
+    if _get_setting(cursor, 'guests_csv_fingerprint') == fingerprint:
+        return False
+
+    wanted = {}
+    for row in csv.DictReader(io.StringIO(data.decode('utf-8-sig'))):
+        first_name = (row.get('first_name') or '').strip()
+        last_name = (row.get('last_name') or '').strip()
+        if first_name and last_name:
+            full_name = f"{first_name} {last_name}"
+            wanted.setdefault(full_name, []).append((first_name, last_name, full_name))
+
+    # Existing guests are matched on full name; anyone who has submitted (or
+    # was added manually at the kiosk) is always kept
+    cursor.execute('''
+        SELECT g.id, g.full_name,
+               g.has_submitted OR EXISTS (SELECT 1 FROM responses r WHERE r.guest_id = g.id) AS keep
+        FROM guests g
+        ORDER BY g.id
+    ''')
+    existing = {}
+    for row in cursor.fetchall():
+        existing.setdefault(row['full_name'], []).append(row)
+
+    inserts, deletes = [], []
+    for full_name, rows in wanted.items():
+        have = existing.get(full_name, [])
+        inserts.extend(rows[len(have):])
+    for full_name, rows in existing.items():
+        surplus = len(rows) - len(wanted.get(full_name, []))
+        removable = [row['id'] for row in reversed(rows) if not row['keep']]
+        deletes.extend((guest_id,) for guest_id in removable[:max(surplus, 0)])
+
+    cursor.executemany('''
+        INSERT INTO guests (first_name, last_name, full_name)
+        VALUES (?, ?, ?)
+    ''', inserts)
+    cursor.executemany('DELETE FROM guests WHERE id = ?', deletes)
+
+    _set_setting(cursor, 'guests_csv_fingerprint', fingerprint)
+    print(f"Synced guests from {csv_path} ({len(inserts)} added, {len(deletes)} removed)")
+    return True
+
+def sync_data(csv_path):
+    """Bring the questions and guests tables in line with config and the CSV.
+
+    Each source is fingerprinted and skipped if unchanged since the last
+    sync; otherwise rows are upserted/diffed in a single transaction, so
+    existing IDs, submissions and actual answers survive a restart.
+    Returns {'questions': changed, 'guests': changed}.
+    """
+    global _questions_version
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        changed = {
+            'questions': _sync_questions(cursor),
+            'guests': _sync_guests(cursor, csv_path)
+        }
+        if any(changed.values()):
+            _refresh_scores(cursor)
+        if changed['guests']:
+            # The guest list is loaded in bulk, so refresh the planner's
+            # row counts now rather than leave ones from an emptier table
+            cursor.execute('ANALYZE guests')
+        conn.commit(versioned=False)
+        if changed['questions']:
+            _questions_version += 1
+            _reset_question_registry()
+        if changed['guests']:
+            _build_guest_index(cursor)
+            _reset_guest_snapshot()
+        if any(changed.values()):
+            _bump_data_version()
     except Exception as e:
-        print(f"Error loading questions: {e}")
+        conn.rollback()
+        print(f"Error syncing data: {e}")
+        changed = {'questions': False, 'guests': False}
     finally:
         conn.close()
 
+    return changed
+
 # Guest operations
 def get_guest_by_id(guest_id):
     """Get a guest by ID"""
@@ -151,20 +632,62 @@ def get_guest_by_name(first_name, last_name):
     conn.close()
     return dict(guest) if guest else None
 
+# In-memory search index over guest names, built from the guests table on
+# first use and kept in step by the functions that add or update guests
+_guest_index = None
+_guest_index_lock = threading.Lock()
+
+def _build_guest_index(cursor):
+    """(Re)build the guest search index from the guests table"""
+    global _guest_index
+    cursor.execute('SELECT * FROM guests')
+    _guest_index = GuestIndex(dict(row) for row in cursor.fetchall())
+    return _guest_index
+
+def get_guest_index():
+    """Get the guest search index, building it if needed"""
+    with _guest_index_lock:
+        if _guest_index is not None:
+            return _guest_index
+        conn = get_db_connection()
+        try:
+            return _build_guest_index(conn.cursor())
+        finally:
+            conn.close()
+
 def search_guests(query):
-    """Search for guests by name (case-insensitive)"""
+    """Search for guests by name (case/accent-insensitive, typo-tolerant)"""
+    return get_guest_index().search(query, limit=20)
+
+# Compact guest list for client-side search, cached until a guest is added
+# or submits. The version is a content hash so it survives restarts.
+_guest_snapshot = None
+
+def _reset_guest_snapshot():
+    global _guest_snapshot
+    _guest_snapshot = None
+
+def get_guest_snapshot():
+    """Get (version, guests) where guests is a list of {id, name, submitted}"""
+    global _guest_snapshot
+    snapshot = _guest_snapshot
+    if snapshot is not None:
+        return snapshot
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    search_term = f"%{query}%"
-    cursor.execute('''
-        SELECT * FROM guests
-        WHERE first_name LIKE ? OR last_name LIKE ? OR full_name LIKE ?
-        ORDER BY full_name
-        LIMIT 20
-    ''', (search_term, search_term, search_term))
-    guests = [dict(row) for row in cursor.fetchall()]
+    cursor.execute('SELECT id, full_name, has_submitted FROM guests ORDER BY full_name')
+    guests = [{
+        'id': row['id'],
+        'name': row['full_name'],
+        'submitted': bool(row['has_submitted'])
+    } for row in cursor.fetchall()]
     conn.close()
-    return guests
+
+    payload = json.dumps(guests, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    version = hashlib.sha1(payload).hexdigest()[:16]
+    _guest_snapshot = (version, guests)
+    return _guest_snapshot
 
 def get_all_guests():
     """Get all guests"""
@@ -175,17 +698,12 @@ def get_all_guests():
     conn.close()
     return guests
 
-def mark_guest_submitted(guest_id, qr_code_path, unique_token):
-    """Mark a guest as submitted and store QR code info"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE guests
-        SET has_submitted = 1, submission_time = ?, qr_code_path = ?, unique_token = ?
-        WHERE id = ?
-    ''', (datetime.now().isoformat(), qr_code_path, unique_token, guest_id))
-    conn.commit()
-    conn.close()
+def _guest_submitted(guest_id, submission_time, qr_code_path, unique_token):
+    """Bring in-memory guest caches up to date after a committed submission"""
+    if _guest_index is not None:
+        _guest_index.update(guest_id, has_submitted=1, submission_time=submission_time,
+                            qr_code_path=qr_code_path, unique_token=unique_token)
+    _reset_guest_snapshot()
 
 def guest_has_submitted(guest_id):
     """Check if a guest has already submitted"""
@@ -196,10 +714,7 @@ def guest_has_submitted(guest_id):
     conn.close()
     return dict(result)['has_submitted'] if result else False
 
-def create_manual_guest(full_name):
-    """Create a guest record for a manual entry (not from CSV)"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def _insert_manual_guest(cursor, full_name):
     parts = full_name.strip().split(None, 1)
     first_name = parts[0] if parts else full_name
     last_name = parts[1] if len(parts) > 1 else ''
@@ -207,10 +722,28 @@ def create_manual_guest(full_name):
         INSERT INTO guests (first_name, last_name, full_name)
         VALUES (?, ?, ?)
     ''', (first_name, last_name, full_name))
-    conn.commit()
-    new_id = cursor.lastrowid
+    return cursor.lastrowid
+
+def assign_guest_tokens():
+    """Give every guest without a QR token a fresh one; returns all guests"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT id FROM guests WHERE unique_token IS NULL')
+    missing = [row['id'] for row in cursor.fetchall()]
+    cursor.executemany('UPDATE guests SET unique_token = ? WHERE id = ?',
+                       [(secrets.token_urlsafe(16), guest_id) for guest_id in missing])
+    conn.commit(versioned=False)
+
+    cursor.execute('SELECT * FROM guests ORDER BY id')
+    guests = [dict(row) for row in cursor.fetchall()]
     conn.close()
-    return new_id
+
+    if missing and _guest_index is not None:
+        for guest in guests:
+            _guest_index.update(guest['id'], unique_token=guest['unique_token'])
+    if missing:
+        _bump_data_version()
+    return guests
 
 def get_submitted_guests():
     """Get all guests who have submitted, ordered by first name"""
@@ -226,21 +759,43 @@ def get_submitted_guests():
     return guests
 
 # Question operations
+
+# Question registry — questions change only when an actual answer is entered
+# or config is re-synced, so they're read once and shared between requests
+_question_registry = None
+_question_registry_lock = threading.Lock()
+
+def get_question_registry():
+    """Get the QuestionRegistry of active questions, building it if needed"""
+    global _question_registry
+    with _question_registry_lock:
+        if _question_registry is None:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM questions
+                WHERE is_active = 1
+                ORDER BY order_index
+            ''')
+            _question_registry = QuestionRegistry(cursor.fetchall(), Config.QUESTIONS)
+            conn.close()
+        return _question_registry
+
+def _reset_question_registry():
+    global _question_registry
+    with _question_registry_lock:
+        _question_registry = None
+
 def get_questions():
-    """Get all active questions ordered"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM questions
-        WHERE is_active = 1
-        ORDER BY order_index
-    ''')
-    questions = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return questions
+    """Get all active questions ordered (read-only mappings, from the registry)"""
+    return get_question_registry().questions
 
 def get_question_by_id(question_id):
-    """Get a question by ID"""
+    """Get a question by ID (inactive questions are read from the database)"""
+    question = get_question_registry().get(question_id)
+    if question is not None:
+        return question
+
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM questions WHERE id = ?', (question_id,))
@@ -248,58 +803,112 @@ def get_question_by_id(question_id):
     conn.close()
     return dict(question) if question else None
 
+def _parse_actual_answer(actual_answer):
+    """Convert an admin-entered actual answer to a float (or None if blank)"""
+    try:
+        return float(actual_answer) if actual_answer else None
+    except (ValueError, TypeError):
+        return None
+
 def update_actual_answer(question_id, actual_answer):
     """Update the actual answer for a question (admin only)"""
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Convert to float if it's a number
-    try:
-        actual_answer = float(actual_answer) if actual_answer else None
-    except (ValueError, TypeError):
-        actual_answer = None
-
     cursor.execute('''
         UPDATE questions
         SET actual_answer = ?
         WHERE id = ?
-    ''', (actual_answer, question_id))
-    conn.commit()
+    ''', (_parse_actual_answer(actual_answer), question_id))
+
+    # Only guests who answered this question can have changed score
+    _refresh_scores(cursor, 'SELECT guest_id FROM responses WHERE question_id = ?', (question_id,))
+    conn.commit(versioned=False)
     conn.close()
+    _reset_question_registry()
+    _bump_data_version()
 
-# Response operations
-def save_response(guest_id, question_id, answer):
-    """Save or update a guest's response"""
+def update_actual_answers(actual_answers):
+    """Update several actual answers at once ({question_id: answer}).
+
+    Writes every answer in one transaction and rebuilds the leaderboard once,
+    rather than once per question.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Handle time format (HH:MM) by converting to minutes for storage
-    if isinstance(answer, str) and ':' in answer:
-        try:
-            hours, minutes = answer.split(':')
-            answer = int(hours) * 60 + int(minutes)  # Store as total minutes
-        except (ValueError, TypeError):
-            conn.close()
-            return False
-    else:
-        try:
-            answer = float(answer)
-        except (ValueError, TypeError):
-            conn.close()
-            return False
+    cursor.executemany('''
+        UPDATE questions
+        SET actual_answer = ?
+        WHERE id = ?
+    ''', [(_parse_actual_answer(answer), question_id)
+          for question_id, answer in actual_answers.items()])
+
+    _refresh_scores(cursor)
+    conn.commit(versioned=False)
+    conn.close()
+    _reset_question_registry()
+    _bump_data_version()
+
+# Response operations
+def submit_guest_answers(guest_id, answers, qr_code_path, unique_token, full_name=None):
+    """Save all of a guest's answers and mark them submitted in one transaction.
+
+    answers maps question IDs to raw answers ("HH:MM" or numbers); invalid
+    answers and unknown questions are skipped. Pass guest_id=None with a
+    full_name to create a manual-entry guest in the same transaction.
+    Returns the guest's ID, or None if they had already submitted (in which
+    case nothing is written).
+    """
+    questions = get_question_registry()    # Read before taking the write lock
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    submission_time = datetime.now().isoformat()
 
     try:
+        cursor.execute('BEGIN IMMEDIATE')
+        if guest_id is None:
+            guest_id = _insert_manual_guest(cursor, full_name)
+
+        # Claim the submission first so two kiosks can't both submit a guest
         cursor.execute('''
-            INSERT OR REPLACE INTO responses (guest_id, question_id, answer)
-            VALUES (?, ?, ?)
-        ''', (guest_id, question_id, answer))
-        conn.commit()
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error saving response: {e}")
+            UPDATE guests
+            SET has_submitted = 1, submission_time = ?, qr_code_path = ?, unique_token = ?
+            WHERE id = ? AND NOT has_submitted
+        ''', (submission_time, qr_code_path, unique_token, guest_id))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return None
+
+        rows = []
+        for question_id, answer in answers.items():
+            try:
+                question = questions.get(int(question_id))
+            except (ValueError, TypeError):
+                continue
+            encoded = answer_codec.encode(answer, question['question_type'], question['unit']) if question else None
+            if encoded is not None:
+                rows.append((guest_id, question['id']) + encoded)
+
+        cursor.executemany('''
+            INSERT OR REPLACE INTO responses (guest_id, question_id, answer, answer_display, answer_unit)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        _refresh_scores(cursor, 'SELECT ?', (guest_id,))
+        conn.commit(versioned=False)
+
+        if full_name is not None and _guest_index is not None:
+            cursor.execute('SELECT * FROM guests WHERE id = ?', (guest_id,))
+            _guest_index.add(dict(cursor.fetchone()))
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         conn.close()
-        return False
+
+    _guest_submitted(guest_id, submission_time, qr_code_path, unique_token)
+    _bump_data_version()
+    return guest_id
 
 def get_guest_responses(guest_id):
     """Get all responses for a guest"""
@@ -316,20 +925,25 @@ def get_guest_responses(guest_id):
     conn.close()
     return responses
 
-def get_all_responses_by_question(question_id):
-    """Get all responses for a specific question"""
+def get_responses_by_question(question_ids):
+    """Get all responses to several questions in one query ({question_id: [responses]})"""
+    grouped = {question_id: [] for question_id in question_ids}
+    if not grouped:
+        return grouped
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT r.*, g.full_name
         FROM responses r
         JOIN guests g ON r.guest_id = g.id
-        WHERE r.question_id = ?
-        ORDER BY r.answer
-    ''', (question_id,))
-    responses = [dict(row) for row in cursor.fetchall()]
+        WHERE r.question_id IN ({', '.join('?' * len(grouped))})
+        ORDER BY r.question_id, r.answer
+    ''', list(grouped))
+    for row in cursor.fetchall():
+        grouped[row['question_id']].append(dict(row))
     conn.close()
-    return responses
+    return grouped
 
 def get_guest_by_token(token):
     """Get guest by their unique QR code token"""
@@ -340,140 +954,177 @@ def get_guest_by_token(token):
     conn.close()
     return dict(guest) if guest else None
 
-# Statistics
-def get_submission_count():
-    """Get count of guests who have submitted"""
+# QR render jobs
+def create_qr_job(token, guest_id, url):
+    """Record a pending QR render for a guest's token"""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) as submitted FROM guests WHERE has_submitted = 1')
-    result = cursor.fetchone()
-    cursor.execute('SELECT COUNT(*) as total FROM guests')
-    total = cursor.fetchone()
+    cursor.execute('''
+        INSERT OR REPLACE INTO qr_jobs (token, guest_id, url, status)
+        VALUES (?, ?, ?, 'pending')
+    ''', (token, guest_id, url))
+    conn.commit(versioned=False)  # Render bookkeeping; no cached response shows it
     conn.close()
 
-    return {
-        'submitted': dict(result)['submitted'],
-        'total': dict(total)['total']
-    }
-
-def calculate_score(guest_id):
-    """Calculate a guest's score (average percentage error)"""
+def finish_qr_job(token, error=None):
+    """Mark a QR render as ready, or failed if an error message is given"""
     conn = get_db_connection()
     cursor = conn.cursor()
-
     cursor.execute('''
-        SELECT r.answer, q.actual_answer
-        FROM responses r
-        JOIN questions q ON r.question_id = q.id
-        WHERE r.guest_id = ? AND q.actual_answer IS NOT NULL
-    ''', (guest_id,))
-
-    responses = cursor.fetchall()
+        UPDATE qr_jobs
+        SET status = ?, error = ?, finished_at = ?
+        WHERE token = ?
+    ''', ('failed' if error else 'ready', error, datetime.now().isoformat(), token))
+    conn.commit(versioned=False)
     conn.close()
 
-    if not responses:
-        return None
+def get_qr_job(token):
+    """Get a QR render job by token"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM qr_jobs WHERE token = ?', (token,))
+    job = cursor.fetchone()
+    conn.close()
+    return dict(job) if job else None
 
-    total_error = 0
-    for row in responses:
-        guess = row[0]
-        actual = row[1]
+def get_ready_qr_jobs():
+    """Get QR render jobs marked as rendered"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT token, url FROM qr_jobs WHERE status = 'ready'")
+    jobs = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return jobs
 
-        if actual == 0:
-            error = abs(guess - actual)
-        else:
-            error = abs(guess - actual) / actual * 100
+def requeue_qr_jobs(tokens):
+    """Mark QR render jobs as pending again (their image was lost)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.executemany('''
+        UPDATE qr_jobs
+        SET status = 'pending', error = NULL, finished_at = NULL
+        WHERE token = ?
+    ''', [(token,) for token in tokens])
+    conn.commit(versioned=False)
+    conn.close()
 
-        total_error += error
+def get_pending_qr_jobs():
+    """Get QR render jobs that have not finished, oldest first"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM qr_jobs WHERE status = 'pending' ORDER BY created_at")
+    jobs = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return jobs
 
-    return total_error / len(responses)
+# Server-side sessions
+def init_sessions_table():
+    """Create the sessions table if needed (sessions can be opened before init_db runs)"""
+    conn = get_db_connection()
+    _create_sessions_table(conn.cursor())
+    conn.commit(versioned=False)
+    conn.close()
 
-def get_leaderboard():
-    """Get all submitted guests ranked by score"""
+def load_session(sid, now):
+    """Get a stored session as (serialised data, expires_at), or None if missing or expired"""
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute('SELECT data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?', (sid, now))
+    row = cursor.fetchone()
+    conn.close()
+    return (row['data'], row['expires_at']) if row else None
 
+def store_session(sid, data, expires_at):
+    """Insert or replace a session's serialised data"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
     cursor.execute('''
-        SELECT id, full_name, submission_time
-        FROM guests
-        WHERE has_submitted = 1
-        ORDER BY submission_time
-    ''')
+        INSERT INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)
+        ON CONFLICT(sid) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+    ''', (sid, data, expires_at))
+    conn.commit(versioned=False)
+    conn.close()
 
-    guests = [dict(row) for row in cursor.fetchall()]
+def delete_session(sid):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+    conn.commit(versioned=False)
     conn.close()
 
-    leaderboard = []
-    for guest in guests:
-        score = calculate_score(guest['id'])
-        if score is not None:
-            leaderboard.append({
-                'id': guest['id'],
-                'name': guest['full_name'],
-                'score': round(score, 2),
-                'submission_time': guest['submission_time']
-            })
+def purge_expired_sessions(now):
+    """Delete expired sessions; returns how many were removed"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM sessions WHERE expires_at <= ?', (now,))
+    removed = cursor.rowcount
+    conn.commit(versioned=False)
+    conn.close()
+    return removed
 
-    # Sort by score (ascending = best)
-    leaderboard.sort(key=lambda x: x['score'])
+# Statistics
+def get_submission_count():
+    """Get count of guests who have submitted"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) as submitted FROM guests WHERE has_submitted = 1')
+    result = cursor.fetchone()
+    cursor.execute('SELECT COUNT(*) as total FROM guests')
+    total = cursor.fetchone()
+    conn.close()
 
-    # Add rank
-    for i, entry in enumerate(leaderboard):
-        entry['rank'] = i + 1
+    return {
+        'submitted': dict(result)['submitted'],
+        'total': dict(total)['total']
+    }
 
-    return leaderboard
+# Per-response absolute percentage error; an actual answer of 0 falls back to
+# the absolute difference so it can't divide by zero
+APE_SQL = '''
+    CASE WHEN q.actual_answer = 0
+         THEN ABS(r.answer - q.actual_answer)
+         ELSE ABS(r.answer - q.actual_answer) / q.actual_answer * 100
+    END
+'''
 
-def get_question_leaderboard(question_id):
-    """Get leaderboard for a specific question - ranked by closest answer"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def _refresh_scores(cursor, guest_ids_sql=None, params=()):
+    """Recompute materialized leaderboard rows.
 
-    # Get the question's actual answer
-    cursor.execute('SELECT actual_answer FROM questions WHERE id = ?', (question_id,))
-    question_row = cursor.fetchone()
-    if not question_row or question_row['actual_answer'] is None:
-        conn.close()
-        return []
+    guest_ids_sql is a subquery selecting the guest IDs to refresh (with its
+    parameters in params); when omitted the whole table is rebuilt. Runs on the
+    caller's cursor so it commits with the change that triggered it.
+    """
+    if guest_ids_sql is None:
+        cursor.execute('DELETE FROM leaderboard_scores')
+        guest_filter = ''
+    else:
+        cursor.execute(f'DELETE FROM leaderboard_scores WHERE guest_id IN ({guest_ids_sql})', params)
+        guest_filter = f'AND g.id IN ({guest_ids_sql})'
+
+    cursor.execute(f'''
+        INSERT INTO leaderboard_scores (guest_id, full_name, submission_time, score)
+        SELECT g.id, g.full_name, g.submission_time, ROUND(AVG({APE_SQL}), 2)
+        FROM guests g
+        JOIN responses r ON r.guest_id = g.id
+        JOIN questions q ON r.question_id = q.id
+        WHERE g.has_submitted = 1 AND q.is_active = 1 AND q.actual_answer IS NOT NULL {guest_filter}
+        GROUP BY g.id
+    ''', params)
 
-    actual_answer = question_row['actual_answer']
+def get_leaderboard():
+    """Get all submitted guests ranked by score"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
 
-    # Get all responses for this question with guest names
+    # Ties on the rounded score go to whoever submitted first
     cursor.execute('''
-        SELECT r.answer, g.id, g.full_name
-        FROM responses r
-        JOIN guests g ON r.guest_id = g.id
-        WHERE r.question_id = ? AND g.has_submitted = 1
-    ''', (question_id,))
+        SELECT guest_id AS id, full_name AS name, score, submission_time,
+               ROW_NUMBER() OVER (ORDER BY score, submission_time, guest_id) AS rank
+        FROM leaderboard_scores
+        ORDER BY score, submission_time, guest_id
+    ''')
 
-    responses = cursor.fetchall()
+    leaderboard = [dict(row) for row in cursor.fetchall()]
     conn.close()
 
-    # Calculate difference from actual answer
-    leaderboard = []
-    for row in responses:
-        answer = row['answer']
-        difference = abs(answer - actual_answer)
-        leaderboard.append({
-            'id': row['id'],
-            'name': row['full_name'],
-            'answer': answer,
-            'difference': round(difference, 1) if difference != int(difference) else int(difference)
-        })
-
-    # Sort by difference (ascending = closest to actual)
-    leaderboard.sort(key=lambda x: x['difference'])
-
-    # Add rank
-    for i, entry in enumerate(leaderboard):
-        entry['rank'] = i + 1
-
     return leaderboard
-
-# Initialization
-if __name__ == '__main__':
-    # This script can be run to initialize the database
-    print("Initializing database...")
-    init_db()
-    load_questions_from_config()
-    load_guests_from_csv(Config.GUESTS_CSV_PATH)
-    print("Database initialized!")
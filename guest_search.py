@@ -0,0 +1,226 @@
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+_APOSTROPHES = re.compile(r"['\u2019]")
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+def fold(text):
+    """Lower-case, strip accents and punctuation: "Zoë O'Brien" -> 'zoe obrien'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(' ', _APOSTROPHES.sub('', stripped.casefold())).strip()
+
+def trigrams(token):
+    """Trigrams of a token, padded at the start so prefixes weigh more"""
+    padded = f'  {token}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def deletions(token):
+    """The token and each string one deleted letter away from it.
+
+    Two words share one of these exactly when they're at most a letter
+    apart (missing, extra, changed or two adjacent letters swapped), give
+    or take a few two-letter edits.
+    """
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+class GuestIndex:
+    """In-memory name index for the kiosk's guest search.
+
+    Short query words are matched by prefix against a sorted token list;
+    longer ones that match nothing also go through a deletion index (one
+    typo away) and then a trigram index, so typos still find the right
+    guest. Results are ranked by how well each query word matches a name
+    word (exact > prefix > one typo > substring > fuzzy), then
+    alphabetically.
+
+    A word matching more than CANDIDATE_LIMIT name words contributes only
+    its first CANDIDATE_LIMIT hits in (word, full name) order, plus the
+    guests the other query words found; typo matching only runs when no
+    guest prefix-matches every query word or prefixes can't fill a page.
+    """
+
+    MIN_SCORE = 0.35
+    CANDIDATE_LIMIT = 200
+    TYPO_MIN_LENGTH = 4     # Shorter words only match a name word with one more letter
+
+    def __init__(self, guests=()):
+        self._lock = threading.Lock()
+        self._guests = {}       # id -> guest dict
+        self._tokens = {}       # id -> folded name tokens
+        self._folded = {}       # id -> folded full name
+        self._prefix = []       # sorted (token, folded full name, id) triples
+        self._postings = {}     # trigram -> set of ids
+        self._near = {}         # token or token less one letter -> set of ids
+        for guest in guests:
+            self._add(dict(guest), sort=False)
+        self._prefix.sort()
+
+    def __len__(self):
+        return len(self._guests)
+
+    def add(self, guest):
+        """Add or replace a guest (a dict with at least id and full_name)"""
+        with self._lock:
+            if guest['id'] in self._guests:
+                self._remove(guest['id'])
+            self._add(dict(guest))
+
+    def update(self, guest_id, **fields):
+        """Update stored fields for a guest, e.g. has_submitted"""
+        with self._lock:
+            guest = self._guests.get(guest_id)
+            if guest is None:
+                return
+            guest = dict(guest, **fields)
+            self._remove(guest_id)
+            self._add(guest)
+
+    def _add(self, guest, sort=True):
+        guest_id = guest['id']
+        folded = fold(guest.get('full_name') or f"{guest.get('first_name', '')} {guest.get('last_name', '')}")
+        tokens = tuple(folded.split())
+        self._guests[guest_id] = guest
+        self._tokens[guest_id] = tokens
+        self._folded[guest_id] = folded
+        for token in tokens:
+            if sort:
+                bisect.insort(self._prefix, (token, folded, guest_id))
+            else:
+                self._prefix.append((token, folded, guest_id))
+            for gram in trigrams(token):
+                self._postings.setdefault(gram, set()).add(guest_id)
+            for variant in deletions(token):
+                self._near.setdefault(variant, set()).add(guest_id)
+
+    def _remove(self, guest_id):
+        folded = self._folded.get(guest_id)
+        for token in self._tokens.pop(guest_id, ()):
+            i = bisect.bisect_left(self._prefix, (token, folded, guest_id))
+            if i < len(self._prefix) and self._prefix[i] == (token, folded, guest_id):
+                del self._prefix[i]
+            for gram in trigrams(token):
+                self._postings.get(gram, set()).discard(guest_id)
+            for variant in deletions(token):
+                self._near.get(variant, set()).discard(guest_id)
+        self._folded.pop(guest_id, None)
+        self._guests.pop(guest_id, None)
+
+    def _prefix_range(self, word):
+        """Slice of the sorted token list whose tokens start with `word`"""
+        # Folded tokens are [0-9a-z], so '{' sorts after every continuation
+        return bisect.bisect_left(self._prefix, (word,)), bisect.bisect_left(self._prefix, (word + '{',))
+
+    def _prefix_scores(self, word, lo, hi, candidates=()):
+        """Exact and prefix matches for `word`: {id: score}.
+
+        Only the first CANDIDATE_LIMIT entries of the range are taken (in
+        (word, full name) order), plus the guests in `candidates`, which are
+        checked against their own name words.
+        """
+        scores = {}
+        for guest_id in candidates:
+            for token in self._tokens[guest_id]:
+                if token.startswith(word):
+                    scores[guest_id] = max(scores.get(guest_id, 0), 1.0 if token == word else 0.9)
+        for token, _, guest_id in self._prefix[lo:min(hi, lo + self.CANDIDATE_LIMIT)]:
+            scores[guest_id] = max(scores.get(guest_id, 0), 1.0 if token == word else 0.9)
+        return scores
+
+    def _fuzzy_scores(self, word, scores):
+        """Add typo and substring matches for `word` to `scores`"""
+        # A name word one typo away is almost certainly the one meant, so
+        # the trigram pass is only needed when there isn't one. Short words
+        # only look for a name word with one more letter ("wld" -> wild).
+        variants = deletions(word) if len(word) >= self.TYPO_MIN_LENGTH else (word,)
+        near = set()
+        for variant in variants:
+            near.update(self._near.get(variant, ()))
+        if near:
+            for guest_id in near:
+                scores.setdefault(guest_id, 0.75)
+            return
+
+        # About half the trigrams must be shared before a guest is
+        # considered at all. Anyone sharing that many is in one of the
+        # len - needed + 1 rarest posting lists, so only those are scanned
+        # and the commoner lists are just intersected with what was found.
+        grams = trigrams(word)
+        needed = max(1, len(grams) // 2)
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        scanned = len(grams) - needed + 1
+        counts = Counter()
+        for posting in postings[:scanned]:
+            counts.update(posting)
+        for posting in postings[scanned:]:
+            counts.update(counts.keys() & posting)
+        for guest_id, shared in counts.items():
+            if shared < needed or guest_id in scores:
+                continue
+            if word in self._folded[guest_id]:
+                scores[guest_id] = 0.7
+            else:
+                scores[guest_id] = 0.8 * shared / len(grams)
+
+    def search(self, query, limit=20):
+        """Return up to `limit` guest dicts best matching `query`"""
+        words = fold(query).split()
+        if not words:
+            return []
+        folded_query = ' '.join(words)
+
+        with self._lock:
+            ranges = [self._prefix_range(word) for word in words]
+
+            # Words matching few name words get every prefix hit. Common ones
+            # (a single letter, a popular first name) only score the guests
+            # the others found, those matching every common word, and their
+            # own first hits, so the candidate set stays small whatever the
+            # guest list size.
+            rare = [(word, self._prefix_scores(word, lo, hi))
+                    for word, (lo, hi) in zip(words, ranges) if hi - lo <= self.CANDIDATE_LIMIT]
+            common = [(word, lo, hi) for word, (lo, hi) in zip(words, ranges) if hi - lo > self.CANDIDATE_LIMIT]
+            if len(words) > 1:
+                common_hits = {word: {guest_id for _, _, guest_id in self._prefix[lo:hi]} for word, lo, hi in common}
+                matched_all = set.intersection(*(set(scores) for _, scores in rare), *common_hits.values())
+            else:
+                common_hits = {}
+                matched_all = ranges[0][0] < ranges[0][1]
+
+            # Trigram matches too when a word looks misspelt (no guest
+            # matches every word) or prefixes can't fill a page
+            if not matched_all or sum(hi - lo for lo, hi in ranges) < limit:
+                for word, scores in rare:
+                    if len(word) >= 3:
+                        self._fuzzy_scores(word, scores)
+
+            candidates = set()
+            for _, scores in rare:
+                candidates.update(scores)
+            if len(common_hits) > 1:
+                in_all = set.intersection(*common_hits.values())
+                candidates.update(heapq.nsmallest(self.CANDIDATE_LIMIT, in_all, key=self._folded.get))
+
+            per_word = [scores for _, scores in rare]
+            for word, lo, hi in common:
+                checked = candidates & common_hits[word] if common_hits else ()
+                per_word.append(self._prefix_scores(word, lo, hi, checked))
+
+            totals = Counter()
+            for scores in per_word:
+                totals.update(scores)
+
+            ranked = []
+            for guest_id, total in totals.items():
+                score = total / len(words)
+                if self._folded[guest_id].startswith(folded_query):
+                    score += 0.05
+                if score >= self.MIN_SCORE:
+                    ranked.append((-score, self._folded[guest_id], guest_id))
+
+            best = heapq.nsmallest(limit, ranked)
+            return [dict(self._guests[guest_id]) for _, _, guest_id in best]
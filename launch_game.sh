@@ -21,7 +21,7 @@ sleep 1
 
 # Start the Flask server in the background
 cd "$GAME_DIR" || exit 1
-nohup python app.py > /dev/null 2>&1 &
+nohup python app.py --production > /dev/null 2>&1 &
 
 # Wait for the server to start
 sleep 3
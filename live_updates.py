@@ -0,0 +1,103 @@
+import json
+import queue
+import threading
+
+class LiveUpdates:
+    """Fans admin stats out to Server-Sent Events subscribers.
+
+    State is only read from the database when something changes and at least
+    one admin screen is listening, so idle screens cost no queries. The last
+    state is kept so new subscribers start from it and later updates can be
+    sent as deltas (only the leaderboard rows that changed).
+
+    Each open stream holds a server thread, so at most `max_subscribers`
+    are served at once, and close() ends them all at shutdown.
+    """
+
+    def __init__(self, load_state, keepalive=15, max_subscribers=None):
+        self._load_state = load_state   # () -> {'submission_count': ..., 'leaderboard': [...]}
+        self._keepalive = keepalive
+        self._max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._state = None
+        self._version = 0
+        self._closed = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _has_room(self):
+        return not self._closed and (self._max_subscribers is None
+                                     or len(self._subscribers) < self._max_subscribers)
+
+    def has_room(self):
+        """Whether a new stream would be accepted"""
+        with self._lock:
+            return self._has_room()
+
+    def close(self):
+        """End every open stream and refuse new ones (at server shutdown)"""
+        with self._lock:
+            self._closed = True
+            for subscriber in self._subscribers:
+                subscriber.put(None)
+
+    def publish(self):
+        """Reload the stats and push what changed to every subscriber"""
+        with self._lock:
+            if not self._subscribers:
+                self._state = None  # Nobody listening; load fresh on next connect
+                return
+            old = self._state
+            self._state = self._load_state()
+            self._version += 1
+            event = _format('update', dict(_diff(old, self._state), version=self._version))
+            for subscriber in self._subscribers:
+                subscriber.put(event)
+
+    def stream(self):
+        """Generator of SSE messages for one subscriber: full state, then deltas"""
+        subscriber = queue.Queue()
+        with self._lock:
+            if not self._has_room():
+                return  # Lost a race for the last slot, or shutting down
+            if self._state is None:
+                self._state = self._load_state()
+            subscriber.put(_format('stats', dict(self._state, version=self._version)))
+            self._subscribers.add(subscriber)
+
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    message = subscriber.get(timeout=self._keepalive)
+                except queue.Empty:
+                    # Comment line; keeps proxies from closing the connection and
+                    # lets us notice phones that went away
+                    yield ': keep-alive\n\n'
+                    continue
+                if message is None:
+                    return  # close() was called
+                yield message
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+def _format(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+def _diff(old, new):
+    """Leaderboard rows added or changed since `old`, plus IDs that dropped off"""
+    if old is None:
+        return {'submission_count': new['submission_count'], 'changed': new['leaderboard'], 'removed': [],
+                'full': True}
+    previous = {entry['id']: entry for entry in old['leaderboard']}
+    current = {entry['id'] for entry in new['leaderboard']}
+    return {
+        'submission_count': new['submission_count'],
+        'changed': [entry for entry in new['leaderboard'] if previous.get(entry['id']) != entry],
+        'removed': [guest_id for guest_id in previous if guest_id not in current],
+        'full': False
+    }
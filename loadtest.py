@@ -0,0 +1,443 @@
+"""Load test: simulate a live reception against the real app.
+
+    python loadtest.py --kiosks 4 --admins 2 --phones 10 --duration 60
+
+By default the app is started inside this process on scratch data (a temp
+database and QR folder, seeded from data/guests.csv) and served by the same
+pooled server as `python app.py --production`, so data/wedding.db is never
+touched. Pass --url to load a server that is already running instead — it
+will record real submissions, so only point it at a scratch copy.
+
+Simulated devices:
+- kiosks run the full guest flow: open the search page, type the guest's
+  name into /api/guests/search one keystroke at a time, /start-game, load
+  /questions, /api/save-all-answers, /submit-final and the confirmation
+  page, then move on to the next guest (manual entries once the guest
+  list runs out)
+- admin phones poll /api/admin/leaderboard and /admin/stats
+- guest phones open /answers/<token> for guests who have submitted
+
+Per-route p50/p95/p99 latency, throughput, error counts and lock
+contention (requests that failed with "database is locked") are printed
+and saved as JSON, together with how long each guest flow took.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.cookies import SimpleCookie
+from urllib.parse import quote, urlencode, urlsplit
+
+GUEST_FLOW_TARGET_SECONDS = 90  # ~1.5 min/guest (see README)
+LOCKED = 'database is locked'
+
+_QUESTION_CARD = re.compile(r'data-question-id="(\d+)" data-question-type="(\w+)"')
+
+# ============================================================================
+# RESULTS
+# ============================================================================
+
+class Recorder:
+    """Collects one (route, latency, status) sample per request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []       # (route, latency_ms, status, locked)
+        self.flows = []         # (wall_seconds, server_seconds, requests)
+        self.tokens = []        # Answer-page tokens of guests who submitted
+        self.server_lock_errors = 0
+
+    def add(self, route, latency_ms, status, locked):
+        with self._lock:
+            self.samples.append((route, latency_ms, status, locked))
+
+    def add_flow(self, wall_seconds, server_seconds, requests):
+        with self._lock:
+            self.flows.append((wall_seconds, server_seconds, requests))
+
+    def add_token(self, token):
+        with self._lock:
+            self.tokens.append(token)
+
+    def random_token(self):
+        with self._lock:
+            return random.choice(self.tokens) if self.tokens else None
+
+class LockErrorCounter:
+    """Passes output through while counting "database is locked" errors.
+
+    The app prints an error before it answers 500, so with the server in
+    this process its stdout/stderr show lock failures the responses don't.
+    """
+
+    def __init__(self, stream, recorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    def write(self, text):
+        if LOCKED in text:
+            self._recorder.server_lock_errors += text.count(LOCKED)
+        return self._stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return round(sorted_values[index], 2)
+
+def summarise(recorder, elapsed, settings):
+    """The JSON report for a finished run"""
+    routes = {}
+    for route, latency_ms, status, locked in recorder.samples:
+        entry = routes.setdefault(route, {'latencies': [], 'statuses': {}, 'errors': 0, 'lock_errors': 0})
+        entry['latencies'].append(latency_ms)
+        entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+        entry['errors'] += status == 0 or status >= 500
+        entry['lock_errors'] += locked
+
+    report_routes = {}
+    for route, entry in sorted(routes.items()):
+        latencies = sorted(entry['latencies'])
+        report_routes[route] = {
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': round(latencies[-1], 2),
+            'errors': entry['errors'],
+            'lock_errors': entry['lock_errors'],
+            'statuses': entry['statuses']
+        }
+
+    total = len(recorder.samples)
+    errors = sum(route['errors'] for route in report_routes.values())
+    # A locked request is usually reported in both its response and the
+    # server output, so take whichever saw more rather than adding them
+    lock_errors = max(sum(route['lock_errors'] for route in report_routes.values()),
+                      recorder.server_lock_errors)
+
+    walls = sorted(flow[0] for flow in recorder.flows)
+    servers = sorted(flow[1] for flow in recorder.flows)
+    return {
+        'started': settings.pop('started'),
+        'settings': settings,
+        'elapsed_seconds': round(elapsed, 2),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 2),
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0,
+        'lock_errors': lock_errors,
+        'lock_error_rate': round(lock_errors / total, 4) if total else 0,
+        'routes': report_routes,
+        'guest_flows': {
+            'completed': len(walls),
+            'per_minute': round(len(walls) / elapsed * 60, 2),
+            'target_seconds': GUEST_FLOW_TARGET_SECONDS,
+            'wall_seconds_p50': percentile(walls, 50),
+            'wall_seconds_p95': percentile(walls, 95),
+            'server_seconds_p50': percentile(servers, 50),
+            'server_seconds_p95': percentile(servers, 95),
+            'server_share_of_target_p95': (round(percentile(servers, 95) / GUEST_FLOW_TARGET_SECONDS, 4)
+                                           if servers else None)
+        }
+    }
+
+def print_report(report):
+    print("=" * 78)
+    print(f"{report['requests']} requests in {report['elapsed_seconds']}s "
+          f"({report['throughput_rps']} req/s), {report['errors']} errors, "
+          f"{report['lock_errors']} lock errors")
+    print("-" * 78)
+    print(f"{'Route':<32}{'Count':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Errors':>8}")
+    for route, stats in report['routes'].items():
+        print(f"{route:<32}{stats['requests']:>7}{stats['throughput_rps']:>8}"
+              f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['errors']:>8}")
+    flows = report['guest_flows']
+    print("-" * 78)
+    print(f"Guest flows: {flows['completed']} completed ({flows['per_minute']}/min); "
+          f"server time per guest p50 {flows['server_seconds_p50']}s, p95 {flows['server_seconds_p95']}s "
+          f"of a {flows['target_seconds']}s target")
+    print("=" * 78)
+
+# ============================================================================
+# SIMULATED DEVICES
+# ============================================================================
+
+class Client:
+    """One simulated device: a keep-alive connection and its cookies"""
+
+    def __init__(self, host, port, recorder):
+        self.host = host
+        self.port = port
+        self.recorder = recorder
+        self.cookies = {}
+        self.requests = 0
+        self.busy_ms = 0.0    # Total time spent waiting on responses
+        self._conn = None
+
+    def request(self, method, path, route=None, json_body=None, form=None, headers=None):
+        """Send a request and record it under `route`; returns (status, body bytes)"""
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            body = urlencode(form).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+        start = time.perf_counter()
+        try:
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self._conn.request(method, path, body=body, headers=headers)
+            response = self._conn.getresponse()
+            data = response.read()
+            status = response.status
+            self._remember_cookies(response.headers.get_all('Set-Cookie') or [])
+            if response.will_close:
+                self.close()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            status, data = 0, b''
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.requests += 1
+        self.busy_ms += latency_ms
+
+        self.recorder.add(route or path, latency_ms, status, status >= 500 and LOCKED.encode() in data)
+        return status, data
+
+    def json(self, method, path, route=None, **kwargs):
+        status, data = self.request(method, path, route, **kwargs)
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+    def _remember_cookies(self, headers):
+        for header in headers:
+            for name, morsel in SimpleCookie(header).items():
+                if morsel.value and morsel['expires'] != 'Thu, 01 Jan 1970 00:00:00 GMT':
+                    self.cookies[name] = morsel.value
+                else:
+                    self.cookies.pop(name, None)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def random_answer(question_type):
+    if question_type == 'time':
+        return f"{random.randint(12, 23):02d}:{random.choice(range(0, 60, 5)):02d}"
+    return str(random.randint(1, 100))
+
+class GuestPool:
+    """Guests still to play, shared by all kiosks (manual entries once it runs out)"""
+
+    def __init__(self, guests):
+        self._lock = threading.Lock()
+        self._guests = [guest for guest in guests if not guest['submitted']]
+        random.shuffle(self._guests)
+        self._manual = 0
+
+    def next(self):
+        with self._lock:
+            if self._guests:
+                guest = self._guests.pop()
+                return guest['id'], guest['name']
+            self._manual += 1
+            return -1, f"Load Test {self._manual}"
+
+def run_kiosk(client, pool, stop, think):
+    """Play guests through the full flow until told to stop"""
+    client.request('GET', '/api/guests/snapshot')
+
+    while not stop.is_set():
+        flow_start = time.perf_counter()
+        busy_before, requests_before = client.busy_ms, client.requests
+        guest_id, name = pool.next()
+
+        client.request('GET', '/search')
+        typed = name.split()[0] if guest_id == -1 else name
+        for i in range(1, len(typed) + 1):
+            client.request('GET', f'/api/guests/search?q={quote(typed[:i])}', route='/api/guests/search')
+            time.sleep(think / 10)
+
+        status, started = client.json('POST', '/start-game', json_body={'guest_id': guest_id, 'guest_name': name})
+        if status != 200 or not started:
+            time.sleep(think)
+            continue
+        headers = {'X-Game-Ticket': started['ticket']}
+
+        status, page = client.request('GET', '/questions')
+        answers = {question_id: random_answer(question_type)
+                   for question_id, question_type in _QUESTION_CARD.findall(page.decode('utf-8', 'replace'))}
+        time.sleep(think)
+
+        client.json('POST', '/api/save-all-answers', json_body={'answers': answers}, headers=headers)
+        status, result = client.json('POST', '/submit-final', json_body={'answers': answers}, headers=headers)
+        if status == 200 and result and result.get('qr_url'):
+            token = result['qr_url'].rsplit('/', 1)[-1]
+            client.request('GET', f'/confirmation-complete?name={quote(name)}', route='/confirmation-complete')
+            client.request('GET', f'/api/qr-status/{token}', route='/api/qr-status/<token>')
+            client.recorder.add_token(token)
+            client.recorder.add_flow(time.perf_counter() - flow_start,
+                                     (client.busy_ms - busy_before) / 1000,
+                                     client.requests - requests_before)
+        time.sleep(think)
+
+def run_admin(client, password, stop, interval):
+    """Log in, then poll the leaderboard and stats pages"""
+    client.request('POST', '/admin/login', form={'password': password})
+    while not stop.is_set():
+        client.request('GET', '/api/admin/leaderboard')
+        client.request('GET', '/admin/stats')
+        stop.wait(interval)
+
+def run_phone(client, recorder, stop, interval):
+    """Open answer pages of guests who have submitted"""
+    while not stop.is_set():
+        token = recorder.random_token()
+        if token:
+            client.request('GET', f'/answers/{token}', route='/answers/<token>')
+        stop.wait(interval)
+
+# ============================================================================
+# RUNNING
+# ============================================================================
+
+def start_local_server(threads):
+    """Serve the app on scratch data from a background thread.
+
+    Returns (server, scratch_dir). Config is pointed at the scratch folder
+    before the app (and so the database module) is imported.
+    """
+    from config import Config
+
+    scratch = tempfile.mkdtemp(prefix='wedding-loadtest-')
+    Config.DATABASE_PATH = os.path.join(scratch, 'wedding.db')
+    Config.QR_CODE_DIR = os.path.join(scratch, 'qr_codes')
+
+    import app
+    from server import PooledWSGIServer
+
+    app.init_app_data()
+    server = PooledWSGIServer('127.0.0.1', 0, app.app, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, scratch
+
+def stop_local_server(server, scratch):
+    import app
+
+    server.shutdown()
+    server.server_close()
+    app.qr_renderer.shutdown(wait=False)
+    app.db.close_all_connections()
+    shutil.rmtree(scratch, ignore_errors=True)
+
+def run(host, port, kiosks, admins, phones, duration, think, poll, admin_password, recorder):
+    """Run every simulated device for `duration` seconds; returns the elapsed time"""
+    setup = Client(host, port, Recorder())
+    status, snapshot = setup.json('GET', '/api/guests/snapshot')
+    setup.close()
+    if status != 200 or not snapshot:
+        raise SystemExit(f"Could not load the guest list from the server (status {status})")
+    pool = GuestPool(snapshot['guests'])
+
+    stop = threading.Event()
+    clients = []
+    workers = []
+    for count, target, args in ((kiosks, run_kiosk, (pool, stop, think)),
+                                (admins, run_admin, (admin_password, stop, poll)),
+                                (phones, run_phone, (recorder, stop, poll))):
+        for _ in range(count):
+            client = Client(host, port, recorder)
+            clients.append(client)
+            workers.append(threading.Thread(target=target, args=(client,) + args, daemon=True))
+
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    try:
+        stop.wait(duration)
+    except KeyboardInterrupt:
+        print("Interrupted; writing results so far")
+    stop.set()
+    for worker in workers:
+        worker.join(timeout=35)
+    for client in clients:
+        client.close()
+    return time.perf_counter() - start
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Simulate a live reception against the app')
+    parser.add_argument('--kiosks', type=int, default=4, help='kiosks playing guests through (default: 4)')
+    parser.add_argument('--admins', type=int, default=2, help='admin phones polling stats (default: 2)')
+    parser.add_argument('--phones', type=int, default=10, help='guest phones opening answer pages (default: 10)')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run for (default: 60)')
+    parser.add_argument('--think', type=float, default=0.5,
+                        help='seconds a kiosk guest pauses between steps (default: 0.5)')
+    parser.add_argument('--poll', type=float, default=5,
+                        help='seconds between admin polls and phone page loads (default: 5)')
+    parser.add_argument('--url', help='load an already running server instead of starting one')
+    parser.add_argument('--threads', type=int, default=Config.SERVER_THREADS,
+                        help=f'request threads for the local server (default: {Config.SERVER_THREADS})')
+    parser.add_argument('--admin-password', default=Config.ADMIN_PASSWORD)
+    parser.add_argument('--out', default='loadtest_results.json', help='where to write the JSON report')
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    settings = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'kiosks': args.kiosks, 'admins': args.admins, 'phones': args.phones,
+        'duration': args.duration, 'think': args.think, 'poll': args.poll,
+        'target': args.url or 'local', 'threads': None if args.url else args.threads
+    }
+
+    server = scratch = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        server, scratch = start_local_server(max(1, args.threads))
+        host, port = server.server_address[:2]
+        sys.stdout = LockErrorCounter(sys.stdout, recorder)
+        sys.stderr = LockErrorCounter(sys.stderr, recorder)
+
+    print(f"Load testing http://{host}:{port}: {args.kiosks} kiosks, {args.admins} admin phones, "
+          f"{args.phones} guest phones for {args.duration:g}s")
+    try:
+        elapsed = run(host, port, args.kiosks, args.admins, args.phones, args.duration,
+                      args.think, args.poll, args.admin_password, recorder)
+    finally:
+        if server is not None:
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+            stop_local_server(server, scratch)
+
+    report = summarise(recorder, elapsed, settings)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"Results written to {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import math
+import threading
+import time
+from collections import Counter, deque
+
+from config import Config
+
+# Histogram bucket upper bounds, in milliseconds (and one for query counts)
+TIME_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum and maximum"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the last)"""
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': round(self.sum / self.count, 3) if self.count else 0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': round(self.max, 3)
+        }
+
+# Metric families: (name, help, label name, buckets, Prometheus unit scale)
+FAMILIES = {
+    'request': ('wedding_request_duration_seconds', 'Time to handle a request, by endpoint',
+                'endpoint', TIME_BUCKETS_MS, 1000),
+    'request_queries': ('wedding_request_queries', 'SQL statements run per request, by endpoint',
+                        'endpoint', COUNT_BUCKETS, 1),
+    'request_query_time': ('wedding_request_query_seconds', 'Time spent in SQL per request, by endpoint',
+                           'endpoint', TIME_BUCKETS_MS, 1000),
+    'query': ('wedding_query_duration_seconds', 'Time to run a SQL statement',
+              'statement', TIME_BUCKETS_MS, 1000),
+    'qr_render': ('wedding_qr_render_seconds', 'Time to render a guest QR code',
+                  'stage', TIME_BUCKETS_MS, 1000),
+}
+
+class Metrics:
+    """Timing histograms for requests, SQL statements and QR renders.
+
+    Requests are bracketed by start_request()/finish_request() (from Flask
+    hooks); SQL statements run on the same thread in between are added to
+    that request's query count and time as well as to their own histogram.
+    With query_debug on, requests that run too many statements or repeat
+    one are reported, and slow statements are logged with their plan.
+    """
+
+    def __init__(self, enabled=True, query_debug=False):
+        self.enabled = enabled
+        self.query_debug = query_debug  # Needs `enabled`; see finish_request and slow_query
+        self._lock = threading.Lock()
+        self._histograms = {family: {} for family in FAMILIES}
+        self._local = threading.local()
+        self._statement_labels = {}
+        self.slow_queries = deque(maxlen=50)  # Most recent last
+        self.started = time.time()
+
+    def observe(self, family, label, value):
+        with self._lock:
+            self._observe(family, label, value)
+
+    def _observe(self, family, label, value):
+        # Caller holds self._lock
+        histogram = self._histograms[family].get(label)
+        if histogram is None:
+            histogram = self._histograms[family][label] = Histogram(FAMILIES[family][3])
+        histogram.observe(value)
+
+    def start_request(self):
+        # start, queries, query ms, and per-statement counts when debugging
+        self._local.request = [time.perf_counter(), 0, 0.0, Counter() if self.query_debug else None]
+
+    def finish_request(self, endpoint):
+        """Record the current request; returns (total_ms, queries, query_ms)"""
+        request = getattr(self._local, 'request', None)
+        if request is None:
+            return None
+        self._local.request = None
+        total_ms = (time.perf_counter() - request[0]) * 1000
+        with self._lock:    # All three together, so a snapshot never sees a partial request
+            self._observe('request', endpoint, total_ms)
+            self._observe('request_queries', endpoint, request[1])
+            self._observe('request_query_time', endpoint, request[2])
+        if request[3] is not None:
+            self._check_query_count(endpoint, request[1], request[2], request[3])
+        return total_ms, request[1], request[2]
+
+    def _check_query_count(self, endpoint, queries, query_ms, statements):
+        """Warn about a request that ran too many statements or repeated one"""
+        repeated = [(count, label) for label, count in statements.most_common()
+                    if count >= Config.QUERY_WARN_REPEATS]
+        if queries <= Config.QUERY_WARN_COUNT and not repeated:
+            return
+        print(f"[queries] {endpoint} ran {queries} SQL statements ({query_ms:.1f} ms)"
+              + ("; repeated (possible N+1):" if repeated else ""))
+        for count, label in repeated[:5]:
+            print(f"[queries]   {count}x {label}")
+
+    def record_query(self, sql, elapsed_ms):
+        label = self._statement_labels.get(sql)
+        if label is None:
+            label = self._statement_labels[sql] = statement_label(sql)
+        self.observe('query', label, elapsed_ms)
+
+        request = getattr(self._local, 'request', None)
+        if request is not None:
+            request[1] += 1
+            request[2] += elapsed_ms
+            if request[3] is not None:
+                request[3][label] += 1
+
+    def slow_query(self, sql, elapsed_ms, plan):
+        """Log a statement slower than Config.SLOW_QUERY_MS with its query plan"""
+        label = statement_label(sql, max_length=300)
+        self.slow_queries.append({'time': time.strftime('%H:%M:%S'), 'ms': round(elapsed_ms, 1),
+                                  'statement': label, 'plan': plan})
+        print(f"[queries] Slow query ({elapsed_ms:.1f} ms): {label}")
+        for line in plan:
+            print(f"[queries]   {line}")
+
+    def snapshot(self):
+        """{family: {label: summary}}, labels sorted slowest (by total time) first"""
+        with self._lock:
+            return {
+                family: dict(sorted(((label, histogram.summary()) for label, histogram in histograms.items()),
+                                    key=lambda item: -item[1]['mean'] * item[1]['count']))
+                for family, histograms in self._histograms.items()
+            }
+
+    def prometheus(self):
+        """All histograms in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for family, histograms in self._histograms.items():
+                name, help_text, label_name, buckets, scale = FAMILIES[family]
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for label, histogram in sorted(histograms.items()):
+                    label_value = _escape(label)
+                    cumulative = 0
+                    for bound, count in zip(buckets + (math.inf,), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == math.inf else f'{bound / scale:g}'
+                        lines.append(f'{name}_bucket{{{label_name}="{label_value}",le="{le}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label_name}="{label_value}"}} {histogram.sum / scale:g}')
+                    lines.append(f'{name}_count{{{label_name}="{label_value}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {family: {} for family in FAMILIES}
+            self.started = time.time()
+
+def statement_label(sql, max_length=120):
+    """A SQL statement on one line, shortened, for use as a metric label"""
+    label = ' '.join(sql.split())
+    return label if len(label) <= max_length else label[:max_length - 3] + '...'
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = Metrics(Config.METRICS_ENABLED, Config.QUERY_DEBUG)
@@ -0,0 +1,39 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+class PageCache:
+    """Thread-safe LRU of rendered pages.
+
+    Each entry remembers the version it was rendered against (e.g. the
+    question metadata version); a lookup with a newer version misses, so
+    stale pages are re-rendered on their next request.
+    """
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._items = OrderedDict()     # key -> (version, body, etag)
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """(body, etag) if cached for this version, else None"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._items.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key, version, body):
+        """Cache a rendered page; returns (body, etag)"""
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()[:16]
+        with self._lock:
+            self._items[key] = (version, body, etag)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return body, etag
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import database as db
+import qr_render
+from metrics import metrics
+
+class QRRenderQueue:
+    """Renders guest QR codes on background threads.
+
+    Each job is recorded in the qr_jobs table first, so the confirmation page
+    can poll its status and unfinished jobs can be resumed after a restart.
+    The worker threads (and concurrent.futures) are only started by the
+    first job, so importing the app doesn't pay for them.
+    """
+
+    def __init__(self, render, workers):
+        self._render = render
+        self._workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='qr-render')
+            return self._executor
+
+    def submit(self, token, guest_id, url):
+        """Record a render job and queue it"""
+        db.create_qr_job(token, guest_id, url)
+        self._get_executor().submit(self._run, token, url, time.perf_counter())
+
+    def resume_pending(self):
+        """Re-queue jobs left pending by a previous run.
+
+        Jobs marked ready whose image isn't on disk (always the case with
+        Config.QR_WRITE_TO_DISK off, as the PNG cache died with the last
+        process) are marked pending and rendered again too.
+        """
+        lost = [job['token'] for job in db.get_ready_qr_jobs()
+                if not qr_render.is_rendered(job['token'], job['url'])]
+        if lost:
+            db.requeue_qr_jobs(lost)
+        jobs = db.get_pending_qr_jobs()
+        for job in jobs:
+            self._get_executor().submit(self._run, job['token'], job['url'])
+        return len(jobs)
+
+    def _run(self, token, url, queued_at=None):
+        start = time.perf_counter()
+        if queued_at is not None and metrics.enabled:
+            metrics.observe('qr_render', 'waiting', (start - queued_at) * 1000)
+        try:
+            self._render(token, url)
+            if metrics.enabled:
+                metrics.observe('qr_render', 'rendering', (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            print(f"Error rendering QR code {token}: {e}")
+            db.finish_qr_job(token, error=str(e) or type(e).__name__)
+        else:
+            db.finish_qr_job(token)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+def pregenerate_guest_qr_codes(workers=None, progress=print, force=False):
+    """Assign tokens to every guest and render the QR codes not yet on disk.
+
+    Codes on disk for a different URL (BASE_URL or LOCAL_IP changed since)
+    are rendered again, as is everything with force=True. Afterwards
+    submit_final only has to mark the guest as submitted.
+    Returns (rendered, skipped).
+    """
+    guests = db.assign_guest_tokens()
+    jobs = [(g['unique_token'], qr_render.guest_qr_url(g['unique_token'])) for g in guests]
+    if not force:
+        jobs = [(token, url) for token, url in jobs if not qr_render.is_rendered(token, url)]
+    skipped = len(guests) - len(jobs)
+
+    progress(f"Pre-generating QR codes: {len(jobs)} to render, {skipped} already up to date")
+    rendered = qr_render.render_many(jobs, workers=workers, progress=progress)
+    return rendered, skipped
@@ -0,0 +1,264 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+
+from config import Config
+
+# qrcode and PIL are imported inside the functions that need them, so
+# starting the server doesn't pay for them before the first QR is rendered
+
+FONT_PATH = os.path.join('static', 'fonts', 'Cormorant_Garamond,Outfit',
+                         'Cormorant_Garamond', 'static', 'CormorantGaramond-SemiBold.ttf')
+
+QR_FILL = "#0e0f1f"
+BADGE_BORDER = (14, 15, 31, 255)    # groom-suit colour border
+BADGE_FILL = (255, 255, 255, 255)
+BADGE_TEXT = (84, 15, 59, 255)      # confetti-dark colour
+
+# ============================================================================
+# FONT AND BADGE (built once per size)
+# ============================================================================
+
+@lru_cache(maxsize=None)
+def load_font(size):
+    """Load the badge font at a given size (bundled Cormorant Garamond if present)"""
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype(FONT_PATH, size)
+    except (IOError, OSError):
+        try:
+            return ImageFont.truetype("arial.ttf", size)
+        except (IOError, OSError):
+            return ImageFont.load_default()
+
+@lru_cache(maxsize=16)
+def overlay_badge(img_width):
+    """Pre-render the F+L centre badge for a QR image of the given width.
+
+    QR images only come in a handful of sizes (one per QR version), so each
+    badge is drawn once and pasted onto every code of that size.
+    """
+    from PIL import Image, ImageDraw
+
+    # Centre circle size — ~18% of QR code width (safe with ERROR_CORRECT_H)
+    circle_radius = int(img_width * 0.09)
+    outer = circle_radius + 2
+    centre = outer
+
+    badge = Image.new('RGBA', (outer * 2 + 1, outer * 2 + 1), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(badge)
+
+    # Draw white circle background with slight border
+    draw.ellipse([0, 0, outer * 2, outer * 2], fill=BADGE_BORDER)
+    draw.ellipse(
+        [centre - circle_radius, centre - circle_radius,
+         centre + circle_radius, centre + circle_radius],
+        fill=BADGE_FILL
+    )
+
+    # Draw "F+L" text
+    font = load_font(int(circle_radius * 0.8))
+    text = "F+L"
+    text_bbox = draw.textbbox((0, 0), text, font=font)
+    text_w = text_bbox[2] - text_bbox[0]
+    text_h = text_bbox[3] - text_bbox[1]
+    text_x = centre - text_w // 2
+    text_y = centre - text_h // 2 - text_bbox[1]  # Adjust for font baseline
+    draw.text((text_x, text_y), text, fill=BADGE_TEXT, font=font)
+
+    return badge
+
+# ============================================================================
+# RENDERING
+# ============================================================================
+
+def render_guest_image(url):
+    """Render a guest QR code image (RGB) with the F+L centre badge"""
+    import qrcode
+
+    # Generate QR code with HIGH error correction to allow centre overlay
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color=QR_FILL, back_color="white").convert('RGB')
+
+    # Paste the pre-rendered badge in the centre
+    try:
+        img_w, img_h = img.size
+        badge = overlay_badge(img_w)
+        offset = badge.width // 2
+        img.paste(badge, (img_w // 2 - offset, img_h // 2 - offset), badge)
+    except Exception as e:
+        print(f"Warning: Could not add F+L overlay to QR code: {e}")
+
+    return img
+
+def guest_qr_url(token):
+    """URL a guest's QR code points at"""
+    return f"{Config.BASE_URL}/answers/{token}"
+
+def qr_code_path(token):
+    """Path of a guest's QR image relative to the static folder (as stored in guests)"""
+    return f"qr_codes/{token}.png"
+
+def to_png(img):
+    buf = BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+def qr_file_path(token):
+    return os.path.join(Config.QR_CODE_DIR, f"{token}.png")
+
+def qr_url_path(token):
+    """Sidecar file holding the URL a guest's PNG on disk was rendered for"""
+    return os.path.join(Config.QR_CODE_DIR, f"{token}.url")
+
+def _write_atomic(filepath, data):
+    # Write to a temporary file first so a half-written file is never read
+    with open(filepath + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(filepath + '.tmp', filepath)
+
+def write_to_disk(token, png, url):
+    """Save a guest's PNG, then the URL it encodes (so a crash in between
+    leaves it looking stale rather than current)"""
+    _write_atomic(qr_file_path(token), png)
+    _write_atomic(qr_url_path(token), url.encode('utf-8'))
+
+def rendered_url(token):
+    """The URL a guest's PNG on disk was rendered for (None if unknown)"""
+    try:
+        with open(qr_url_path(token), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+# ============================================================================
+# PNG CACHE
+# ============================================================================
+
+class PNGCache:
+    """Small thread-safe LRU of rendered PNG bytes (and the URL each
+    encodes, if known) keyed by token"""
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            item = self._items.get(token)
+            if item is None:
+                return None
+            self._items.move_to_end(token)
+            return item[0]
+
+    def put(self, token, png, url=None):
+        with self._lock:
+            self._items[token] = (png, url)
+            self._items.move_to_end(token)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def url(self, token):
+        """The URL a cached PNG encodes (None if unknown or not cached)"""
+        with self._lock:
+            item = self._items.get(token)
+            return item[1] if item else None
+
+    def __contains__(self, token):
+        with self._lock:
+            return token in self._items
+
+png_cache = PNGCache(Config.QR_CACHE_SIZE)
+
+def render_guest_qr(token, url):
+    """Render a guest's QR code into the PNG cache (and to disk if enabled)"""
+    png = to_png(render_guest_image(url))
+    png_cache.put(token, png, url)
+
+    if Config.QR_WRITE_TO_DISK:
+        write_to_disk(token, png, url)
+    return png
+
+def get_guest_qr_png(token):
+    """Get a guest's rendered PNG from the cache, falling back to disk"""
+    png = png_cache.get(token)
+    if png is not None:
+        return png
+    try:
+        with open(qr_file_path(token), 'rb') as f:
+            png = f.read()
+    except OSError:
+        return None
+    png_cache.put(token, png, rendered_url(token))
+    return png
+
+def is_rendered(token, url=None):
+    """Whether a guest's PNG exists in the cache or on disk.
+
+    With a url, only a PNG known to encode that URL counts, so codes
+    rendered before BASE_URL (or LOCAL_IP) changed get rendered again.
+    """
+    if token in png_cache and (url is None or png_cache.url(token) == url):
+        return True
+    try:
+        if os.path.getsize(qr_file_path(token)) == 0:
+            return False
+    except OSError:
+        return False
+    return url is None or rendered_url(token) == url
+
+def _render_to_disk(job):
+    """Process-pool worker: render one (token, url) job straight to disk"""
+    token, url = job
+    write_to_disk(token, to_png(render_guest_image(url)), url)
+    return token
+
+def render_many(jobs, workers=None, progress=print):
+    """Render many (token, url) jobs to disk in parallel.
+
+    Uses a process pool across all cores; falls back to threads where
+    multiprocessing isn't available (e.g. some Termux builds). Returns the
+    number of codes rendered.
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+    if not jobs:
+        return 0
+    os.makedirs(Config.QR_CODE_DIR, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    try:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    except (ImportError, OSError, NotImplementedError):
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+    done = 0
+    step = max(1, len(jobs) // 20)
+    with executor:
+        for future in as_completed([executor.submit(_render_to_disk, job) for job in jobs]):
+            future.result()
+            done += 1
+            if progress and (done % step == 0 or done == len(jobs)):
+                progress(f"  Rendered {done}/{len(jobs)} QR codes")
+    return done
+
+@lru_cache(maxsize=4)
+def admin_qr_png(url):
+    """Plain QR code for the admin login URL — rendered once per process"""
+    import qrcode
+
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    qr.add_data(url)
+    qr.make(fit=True)
+    return to_png(qr.make_image(fill_color="black", back_color="white"))
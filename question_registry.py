@@ -0,0 +1,35 @@
+from types import MappingProxyType
+
+class QuestionRegistry:
+    """The active questions, merged with their config-only fields.
+
+    Built from the questions table once and shared by every request until
+    an actual answer changes or the questions are re-synced from config.
+    Each question is a read-only mapping of its database columns plus
+    `min`/`max` from Config.QUESTIONS, with `short_label` falling back to
+    the config value.
+    """
+
+    def __init__(self, rows, config_questions):
+        config = {q['order']: q for q in config_questions}
+        questions = []
+        for row in rows:
+            question = dict(row)
+            cfg = config.get(question['order_index'], {})
+            question['min'] = cfg.get('min')
+            question['max'] = cfg.get('max')
+            question['short_label'] = question.get('short_label') or cfg.get('short_label', '')
+            questions.append(MappingProxyType(question))
+
+        self.questions = tuple(questions)   # Ordered by order_index
+        self.by_id = MappingProxyType({q['id']: q for q in questions})
+        self.valid_ids = frozenset(str(q['id']) for q in questions)  # As used for answer keys
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __iter__(self):
+        return iter(self.questions)
+
+    def get(self, question_id):
+        return self.by_id.get(question_id)
@@ -0,0 +1,203 @@
+import threading
+import warnings
+
+import database as db
+
+# NumPy is imported where it's used so the server starts without loading it;
+# the first leaderboard request that needs the engine pays for it instead
+
+# Scoring rules — lower is better for all of them. The suffix is shown after
+# the score on the leaderboard, and the note (if any) explains the rule there.
+RULES = {
+    'ape': {'label': 'Average % error', 'suffix': '%'},
+    'absolute': {'label': 'Average absolute error', 'suffix': ''},
+    'log_ratio': {'label': 'Average log-ratio error', 'suffix': ''},
+    'rank_sum': {'label': 'Sum of per-question ranks', 'suffix': '',
+                 'note': 'A question left unanswered counts as last place on it '
+                         '(one more than the number of guests who answered).'},
+    'normalised': {'label': 'Average normalised error', 'suffix': ''},
+}
+DEFAULT_RULE = 'ape'
+
+class Scoreboard:
+    """Guests x questions answer matrix with every scoring rule precomputed.
+
+    Built once from the database in a handful of queries; all rules are
+    computed together in vectorised passes so switching rule is a lookup.
+    """
+
+    def __init__(self, guests, questions, responses):
+        import numpy as np
+
+        self.guest_ids = np.array([g['id'] for g in guests], dtype=np.int64)
+        self.names = [g['full_name'] for g in guests]
+        self.submission_times = [g['submission_time'] for g in guests]
+        self._time_keys = np.array([t or '' for t in self.submission_times], dtype=str)
+        self.question_ids = np.array([q['id'] for q in questions], dtype=np.int64)
+        self.actual = np.array(
+            [np.nan if q['actual_answer'] is None else q['actual_answer'] for q in questions],
+            dtype=np.float64
+        )
+
+        # Scatter the (guest, question, answer, answer_display) rows into
+        # dense matrices; missing answers stay NaN (and None). Both ID arrays
+        # come back sorted from SQL.
+        shape = (len(self.guest_ids), len(self.question_ids))
+        self.answers = np.full(shape, np.nan)
+        self.displays = np.full(shape, None, dtype=object)
+        if responses and len(self.guest_ids) and len(self.question_ids):
+            rows = np.array([row[:3] for row in responses], dtype=np.float64)
+            g_idx = np.searchsorted(self.guest_ids, rows[:, 0].astype(np.int64))
+            q_idx = np.searchsorted(self.question_ids, rows[:, 1].astype(np.int64))
+            self.answers[g_idx, q_idx] = rows[:, 2]
+            self.displays[g_idx, q_idx] = [row[3] for row in responses]
+
+        self.errors = np.abs(self.answers - self.actual)
+        self.scores = self._compute_scores()
+
+    def _compute_scores(self):
+        """Return {rule: per-guest score array}; NaN means nothing to score yet"""
+        import numpy as np
+
+        actual = self.actual
+        errors = self.errors
+        scored = ~np.isnan(errors)
+        counts = scored.sum(axis=1)
+
+        def mean(values):
+            total = np.where(scored, values, 0).sum(axis=1)
+            return np.where(counts > 0, total / np.maximum(counts, 1), np.nan)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Same APE as the SQL leaderboard: a zero actual falls back to the
+            # absolute difference
+            ape = np.where(actual == 0, errors, errors / actual * 100)
+
+            # log1p keeps zero answers (e.g. no thank-yous) finite
+            log_ratio = np.abs(np.log1p(np.clip(self.answers, 0, None)) - np.log1p(np.clip(actual, 0, None)))
+
+            # Scale each question's errors by the spread of guesses so
+            # questions in different units contribute comparably
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)  # Unanswered questions
+                spread = np.nanstd(np.where(scored, self.answers, np.nan), axis=0)
+            spread = np.where(np.isnan(spread) | (spread == 0), 1.0, spread)
+            normalised = errors / spread
+
+        # Competition ranking per question (ties share the lower rank). A
+        # guest who skipped a question with a known answer takes last place on
+        # it, so skipping can't beat answering badly.
+        ranks = np.zeros_like(errors)
+        for col in np.flatnonzero(~np.isnan(actual)):
+            present = scored[:, col]
+            ranks[~present, col] = present.sum() + 1
+            if present.any():
+                ordered = np.sort(errors[present, col])
+                ranks[present, col] = np.searchsorted(ordered, errors[present, col], side='left') + 1
+
+        return {
+            'ape': mean(ape),
+            'absolute': mean(errors),
+            'log_ratio': mean(log_ratio),
+            'rank_sum': np.where(counts > 0, ranks.sum(axis=1), np.nan),
+            'normalised': mean(normalised),
+        }
+
+    def leaderboard(self, rule=DEFAULT_RULE):
+        """Ranked guests for a rule, in the same shape as db.get_leaderboard()"""
+        import numpy as np
+
+        scores = np.round(self.scores[rule], 2)
+        has_score = np.flatnonzero(~np.isnan(scores))
+
+        # Ties on the rounded score go to whoever submitted first
+        order = has_score[np.lexsort((
+            self.guest_ids[has_score],
+            self._time_keys[has_score],
+            scores[has_score]
+        ))]
+
+        return [{
+            'id': int(self.guest_ids[i]),
+            'name': self.names[i],
+            'score': float(scores[i]),
+            'submission_time': self.submission_times[i],
+            'rank': rank
+        } for rank, i in enumerate(order, start=1)]
+
+    def question_leaderboard(self, question_id):
+        """Guests ranked by closeness on one question (ties in guest ID order)"""
+        import numpy as np
+
+        col = np.flatnonzero(self.question_ids == question_id)
+        if not len(col) or np.isnan(self.actual[col[0]]):
+            return []
+        col = col[0]
+
+        answered = np.flatnonzero(~np.isnan(self.answers[:, col]))
+        differences = self.errors[answered, col]
+        order = answered[np.argsort(differences, kind='stable')]
+
+        leaderboard = []
+        for rank, i in enumerate(order, start=1):
+            difference = float(self.errors[i, col])
+            leaderboard.append({
+                'id': int(self.guest_ids[i]),
+                'name': self.names[i],
+                'answer': float(self.answers[i, col]),
+                'answer_display': self.displays[i, col],
+                'difference': round(difference, 1) if difference != int(difference) else int(difference),
+                'rank': rank
+            })
+        return leaderboard
+
+def load_scoreboard():
+    """Build a Scoreboard from the current database contents"""
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT id, full_name, submission_time
+        FROM guests
+        WHERE has_submitted = 1
+        ORDER BY id
+    ''')
+    guests = [dict(row) for row in cursor.fetchall()]
+
+    cursor.execute('''
+        SELECT id, actual_answer
+        FROM questions
+        WHERE is_active = 1
+        ORDER BY id
+    ''')
+    questions = [dict(row) for row in cursor.fetchall()]
+
+    cursor.execute('''
+        SELECT r.guest_id, r.question_id, r.answer, r.answer_display
+        FROM responses r
+        JOIN guests g ON r.guest_id = g.id
+        JOIN questions q ON r.question_id = q.id
+        WHERE g.has_submitted = 1 AND q.is_active = 1
+    ''')
+    responses = [tuple(row) for row in cursor.fetchall()]
+    conn.close()
+
+    return Scoreboard(guests, questions, responses)
+
+# Cached scoreboard — rebuilt on next use after invalidate()
+_scoreboard = None
+_scoreboard_lock = threading.Lock()
+
+def get_scoreboard():
+    """Get the cached Scoreboard, building it if needed"""
+    global _scoreboard
+    with _scoreboard_lock:
+        if _scoreboard is None:
+            _scoreboard = load_scoreboard()
+        return _scoreboard
+
+def invalidate():
+    """Drop the cached Scoreboard (call after submissions or answer changes)"""
+    global _scoreboard
+    with _scoreboard_lock:
+        _scoreboard = None
@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from config import Config
+
+class RequestHandler(WSGIRequestHandler):
+    """Werkzeug's request handler, quieter and with an idle timeout.
+
+    An idle keep-alive connection holds a worker thread, so it is dropped
+    after Config.SERVER_IDLE_TIMEOUT seconds rather than waiting forever.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    timeout = Config.SERVER_IDLE_TIMEOUT
+
+    def log_request(self, code='-', size='-'):
+        if Config.DEBUG:
+            super().log_request(code, size)
+
+    def log_error(self, format, *args):
+        if args and args[0] == 'Request timed out: %r':
+            return  # An idle keep-alive connection closing is normal
+        super().log_error(format, *args)
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug's WSGI server with requests handled on a fixed thread pool.
+
+    Unlike the development server (one new thread per connection, no
+    limit), at most `threads` requests run at once and the rest wait their
+    turn, so a burst of phones can't exhaust the tablet.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, streams=()):
+        # Created first: a failed bind calls server_close() from __init__
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+        self.threads = threads
+        self.streams = streams  # Objects with close() ending long-lived responses
+        super().__init__(host, port, app, handler=RequestHandler)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def close_all_streams(self):
+        """End open event streams so their pool threads can finish.
+
+        The pool threads aren't daemons — Python waits for them at exit —
+        so a stream left open would keep the process alive after Ctrl+C.
+        """
+        for stream in self.streams:
+            stream.close()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def serve(app, host, port, threads, streams=()):
+    """Serve `app` until interrupted, then end `streams` and close the pool"""
+    server = PooledWSGIServer(host, port, app, threads, streams)
+    print(f"Serving on http://{host}:{port} with {threads} threads (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    finally:
+        server.close_all_streams()
+        server.server_close()
@@ -0,0 +1,130 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+import database as db
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session data kept on the server; the cookie only carries `sid`"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session backend: an in-memory LRU in front of the sessions table.
+
+    Reads come from memory when the session is cached, otherwise from
+    SQLite, so drafts survive a restart. Writes go to both, and only when the
+    session changed. Sessions expire after `ttl` seconds without a write;
+    reads top that up once less than half of it is left.
+    """
+
+    serializer = TaggedJSONSerializer()
+    PURGE_EVERY = 200  # Writes between sweeps of expired sessions
+
+    def __init__(self, ttl, cache_size):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()     # sid -> (serialised data, expires_at)
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self._writes = 0
+
+    def open_session(self, app, request):
+        if not self._table_ready:
+            db.init_sessions_table()
+            self._table_ready = True
+
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            loaded = self._load(sid)
+            if loaded is not None:
+                data, expires_at = loaded
+                session = ServerSession(self.serializer.loads(data), sid=sid)
+                if expires_at - time.time() < self.ttl / 2:
+                    session.modified = True  # Extend it when the response is saved
+                return session
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            # Cleared (e.g. after submitting) — forget it on both sides
+            if session.modified and not session.new:
+                self._delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+            return
+
+        if session.modified:
+            self._store(session.sid, self.serializer.dumps(dict(session)))
+
+        if session.new or session.modified or self.should_set_cookie(app, session):
+            response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=httponly, domain=domain, path=path, secure=secure,
+                                samesite=samesite)
+
+    def _load(self, sid):
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(sid)
+            if cached is not None:
+                if cached[1] > now:
+                    self._cache.move_to_end(sid)
+                    return cached
+                del self._cache[sid]
+
+        loaded = db.load_session(sid, now)
+        if loaded is not None:
+            self._remember(sid, loaded)
+        return loaded
+
+    def _store(self, sid, data):
+        expires_at = time.time() + self.ttl
+        self._remember(sid, (data, expires_at))
+        db.store_session(sid, data, expires_at)
+
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def _delete(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+        db.delete_session(sid)
+
+    def _remember(self, sid, entry):
+        with self._lock:
+            self._cache[sid] = entry
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def purge_expired(self):
+        """Drop expired sessions from memory and the database"""
+        now = time.time()
+        with self._lock:
+            for sid in [sid for sid, (_, expires_at) in self._cache.items() if expires_at <= now]:
+                del self._cache[sid]
+        return db.purge_expired_sessions(now)
@@ -1,4 +1,4 @@
 @echo off
 echo Starting The Hancox Wedding Sweepstake...
-python app.py
+python app.py --production
 pause
@@ -1,3 +1,3 @@
 #!/bin/bash
 echo "Starting The Hancox Wedding Sweepstake..."
-python app.py
+python app.py --production
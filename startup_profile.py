@@ -0,0 +1,89 @@
+"""Cold-start report for `python app.py --profile-startup`.
+
+Everything is measured in fresh child interpreters so the numbers match a
+real first launch rather than the already-warm profiling process.
+"""
+import json
+import re
+import subprocess
+import sys
+
+_IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+# Runs in a child process: time import, data init and the first request
+_FIRST_RESPONSE_SCRIPT = '''
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.init_app_data()
+initialised = time.perf_counter()
+response = app.app.test_client().get('/')
+responded = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'init_ms': (initialised - imported) * 1000,
+    'first_request_ms': (responded - initialised) * 1000,
+    'total_ms': (responded - start) * 1000,
+    'status': response.status_code,
+}))
+'''
+
+def import_breakdown():
+    """Run `python -X importtime -c "import app"`; return [(module, self_us, cumulative_us, depth)]"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        capture_output=True, text=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return modules
+
+def time_to_first_response():
+    """Time import, init_app_data() and the first GET / in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-c', _FIRST_RESPONSE_SCRIPT],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'profile run failed')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def profile_startup(top=15):
+    """Print the import-time breakdown and time-to-first-response"""
+    modules = import_breakdown()
+    total_us = next((cumulative for name, _, cumulative, _ in modules if name == 'app'), 0)
+
+    print("=" * 60)
+    print("Startup profile")
+    print("=" * 60)
+    print(f"import app: {total_us / 1000:.1f} ms")
+    print()
+    print("Slowest imports made directly by app.py (cumulative):")
+    # Children are listed just before their parent, so app's direct imports
+    # are the depth-1 lines between the previous top-level entry and app
+    end = next((i for i, m in enumerate(modules) if m[0] == 'app' and m[3] == 0), len(modules))
+    start = next((i + 1 for i in range(end - 1, -1, -1) if modules[i][3] == 0), 0)
+    direct = [m for m in modules[start:end] if m[3] == 1]
+    for name, _, cumulative, _ in sorted(direct, key=lambda m: m[2], reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    print()
+    try:
+        timings = time_to_first_response()
+    except RuntimeError as e:
+        print(f"Could not time the first response: {e}")
+        return
+    print("Time to first response:")
+    print(f"  import app      {timings['import_ms']:8.1f} ms")
+    print(f"  init_app_data   {timings['init_ms']:8.1f} ms")
+    print(f"  first GET /     {timings['first_request_ms']:8.1f} ms  (HTTP {timings['status']})")
+    print(f"  total           {timings['total_ms']:8.1f} ms")
+    print("=" * 60)
+
+if __name__ == '__main__':
+    profile_startup()
@@ -0,0 +1,40 @@
+// Live admin stats over Server-Sent Events (/admin/stream).
+// The server sends the full state on connect, then only what changed;
+// onUpdate gets the submission count and the leaderboard sorted by rank.
+function subscribeLiveStats(onUpdate) {
+  if (!window.EventSource) return null;
+
+  const entries = new Map();
+  const source = new EventSource('/admin/stream');
+
+  function ranked() {
+    return Array.from(entries.values()).sort((a, b) => a.rank - b.rank);
+  }
+
+  source.addEventListener('stats', event => {
+    const data = JSON.parse(event.data);
+    entries.clear();
+    data.leaderboard.forEach(entry => entries.set(entry.id, entry));
+    onUpdate(data.submission_count, ranked(), true);
+  });
+
+  source.addEventListener('update', event => {
+    const data = JSON.parse(event.data);
+    if (data.full) entries.clear();
+    data.removed.forEach(id => entries.delete(id));
+    data.changed.forEach(entry => entries.set(entry.id, entry));
+    onUpdate(data.submission_count, ranked(), false);
+  });
+
+  return source;
+}
+
+function rankBadge(rank) {
+  return rank === 1 ? '🥇' : rank === 2 ? '🥈' : rank === 3 ? '🥉' : String(rank);
+}
+
+function escapeHtml(text) {
+  const div = document.createElement('div');
+  div.textContent = text;
+  return div.innerHTML;
+}
@@ -1,44 +1,169 @@
-// Minimal service worker for PWA installability
-// Caches static assets for faster loads on the local network
-
-const CACHE_NAME = 'wedding-game-v1';
-const ASSETS_TO_CACHE = [
-  '/',
-  '/static/css/style.css',
-  '/static/css/bootstrap.min.css',
-  '/static/js/bootstrap.bundle.min.js',
-  '/static/js/fuse.min.js',
-  '/static/manifest.json'
-];
+// Offline-first service worker for the kiosk.
+//
+// PRECACHE ({version, assets: {url: hash}}) is prepended by the /sw.js route
+// from static/precache-manifest.json, so any asset change is a new worker.
+// - Static assets: cache-first from the precache (pages link them as ?v=hash)
+// - Kiosk page shells: served from cache instantly, refreshed in the background
+// - Answer submissions: queued in IndexedDB if the network drops, then
+//   replayed by Background Sync (or when the page reports it's back online)
+
+const ASSET_CACHE = `wedding-assets-${PRECACHE.version}`;
+const PAGE_CACHE = 'wedding-pages-v1';
+const SHELL_URLS = ['/', '/search'];
+const OFFLINE_CONFIRMATION = '/confirmation-complete?queued=1';
+const QUEUED_URLS = ['/api/save-all-answers', '/submit-final'];
+const SYNC_TAG = 'submission-queue';
 
 self.addEventListener('install', event => {
-  event.waitUntil(
-    caches.open(CACHE_NAME)
-      .then(cache => cache.addAll(ASSETS_TO_CACHE))
-      .then(() => self.skipWaiting())
-  );
+  event.waitUntil((async () => {
+    const assets = await caches.open(ASSET_CACHE);
+    // Fetch each asset by its versioned URL (skipping the HTTP cache) and
+    // store it under the plain path, which is also what CSS url()s request
+    await Promise.all(Object.entries(PRECACHE.assets).map(async ([url, hash]) => {
+      const response = await fetch(`${url}?v=${hash}`, { cache: 'reload' });
+      if (response.ok) await assets.put(url, response);
+    }));
+    const pages = await caches.open(PAGE_CACHE);
+    await pages.addAll([...SHELL_URLS, OFFLINE_CONFIRMATION]);
+    await self.skipWaiting();
+  })());
 });
 
 self.addEventListener('activate', event => {
-  event.waitUntil(
-    caches.keys().then(keys =>
-      Promise.all(keys.filter(k => k !== CACHE_NAME).map(k => caches.delete(k)))
-    ).then(() => self.clients.claim())
-  );
+  event.waitUntil((async () => {
+    const keep = [ASSET_CACHE, PAGE_CACHE];
+    const keys = await caches.keys();
+    await Promise.all(keys.filter(k => !keep.includes(k)).map(k => caches.delete(k)));
+    await self.clients.claim();
+    replayQueue().catch(() => {});
+  })());
 });
 
-// Network-first strategy: try network, fall back to cache
 self.addEventListener('fetch', event => {
-  event.respondWith(
-    fetch(event.request)
-      .then(response => {
-        // Cache successful responses for static assets
-        if (response.ok && event.request.url.includes('/static/')) {
-          const clone = response.clone();
-          caches.open(CACHE_NAME).then(cache => cache.put(event.request, clone));
-        }
-        return response;
-      })
-      .catch(() => caches.match(event.request))
-  );
+  const request = event.request;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return;
+
+  // Leave live-update streams to the browser
+  if (request.headers.get('Accept') === 'text/event-stream') return;
+
+  if (request.method === 'POST' && QUEUED_URLS.includes(url.pathname)) {
+    event.respondWith(sendOrQueue(request));
+  } else if (request.method !== 'GET') {
+    return;
+  } else if (url.pathname.startsWith('/static/') && url.pathname in PRECACHE.assets) {
+    event.respondWith(cacheFirst(request));
+  } else if (request.mode === 'navigate' && SHELL_URLS.includes(url.pathname)) {
+    event.respondWith(staleWhileRevalidate(request, event));
+  } else if (url.pathname === '/confirmation-complete') {
+    // A queued submission still gets its thank-you page while offline
+    event.respondWith(fetch(request).catch(() => caches.match(OFFLINE_CONFIRMATION)));
+  } else {
+    event.respondWith(fetch(request).catch(() => caches.match(request)));
+  }
+});
+
+async function cacheFirst(request) {
+  const cached = await caches.match(request, { cacheName: ASSET_CACHE, ignoreSearch: true });
+  return cached || fetch(request);
+}
+
+async function staleWhileRevalidate(request, event) {
+  const pages = await caches.open(PAGE_CACHE);
+  const cached = await pages.match(request);
+  const network = fetch(request).then(response => {
+    if (response.ok && !response.redirected) pages.put(request, response.clone());
+    return response;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => {}));
+    return cached;
+  }
+  return network;
+}
+
+// ---------------------------------------------------------------------------
+// Submission queue
+// ---------------------------------------------------------------------------
+
+async function sendOrQueue(request) {
+  const queued = {
+    url: request.url,
+    headers: {
+      'Content-Type': request.headers.get('Content-Type') || 'application/json',
+      'X-Game-Ticket': request.headers.get('X-Game-Ticket') || ''
+    },
+    body: await request.clone().text(),
+    queuedAt: Date.now()
+  };
+  try {
+    return await fetch(request);
+  } catch (error) {
+    // Without a ticket a replay couldn't say whose answers these are
+    if (!queued.headers['X-Game-Ticket']) throw error;
+    await queueAdd(queued);
+    if (self.registration.sync) {
+      await self.registration.sync.register(SYNC_TAG).catch(() => {});
+    }
+    return new Response(JSON.stringify({ success: true, queued: true }), {
+      status: 202,
+      headers: { 'Content-Type': 'application/json' }
+    });
+  }
+}
+
+self.addEventListener('sync', event => {
+  if (event.tag === SYNC_TAG) event.waitUntil(replayQueue());
+});
+
+self.addEventListener('message', event => {
+  if (event.data === 'replay-submissions') event.waitUntil(replayQueue().catch(() => {}));
 });
+
+let replaying = null;
+
+function replayQueue() {
+  // One replay at a time, in the order the requests were queued
+  replaying = replaying || (async () => {
+    try {
+      for (const item of await queueAll()) {
+        const response = await fetch(item.url, {
+          method: 'POST',
+          headers: item.headers,
+          body: item.body,
+          credentials: 'same-origin'
+        });
+        // Server errors are retried later; anything else (including
+        // "already submitted") is final
+        if (response.status >= 500) throw new Error(`Replay failed: ${response.status}`);
+        await queueDelete(item.id);
+      }
+    } finally {
+      replaying = null;
+    }
+  })();
+  return replaying;
+}
+
+function openQueue() {
+  return new Promise((resolve, reject) => {
+    const open = indexedDB.open('wedding-submissions', 1);
+    open.onupgradeneeded = () => open.result.createObjectStore('queue', { keyPath: 'id', autoIncrement: true });
+    open.onsuccess = () => resolve(open.result);
+    open.onerror = () => reject(open.error);
+  });
+}
+
+async function queueOp(mode, op) {
+  const db = await openQueue();
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction('queue', mode);
+    const result = op(tx.objectStore('queue'));
+    tx.oncomplete = () => { db.close(); resolve(result.result); };
+    tx.onerror = () => { db.close(); reject(tx.error); };
+  });
+}
+
+const queueAdd = item => queueOp('readwrite', store => store.add(item));
+const queueAll = () => queueOp('readonly', store => store.getAll());
+const queueDelete = id => queueOp('readwrite', store => store.delete(id));
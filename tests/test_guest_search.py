@@ -0,0 +1,66 @@
+"""Guest search against the real guest list, with the typos kiosk users make"""
+import csv
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from guest_search import GuestIndex, fold  # noqa: E402
+
+with open(os.path.join(ROOT, 'data', 'guests.csv'), encoding='utf-8') as f:
+    ROWS = list(csv.DictReader(f))
+
+SURNAMES = sorted({fold(row['last_name']) for row in ROWS if len(fold(row['last_name'])) >= 4})
+
+@pytest.fixture(scope='module')
+def index():
+    return GuestIndex({'id': i, 'full_name': f"{row['first_name']} {row['last_name']}"}
+                      for i, row in enumerate(ROWS))
+
+def found(index, query, surname, top=5):
+    return any(surname in fold(guest['full_name']) for guest in index.search(query)[:top])
+
+def swaps(word):
+    return {word[:i] + word[i + 1] + word[i] + word[i + 2:] for i in range(len(word) - 1)} - {word}
+
+def drops(word):
+    return {word[:i] + word[i + 1:] for i in range(1, len(word))}
+
+def doubles(word):
+    return {word[:i] + word[i] + word[i:] for i in range(len(word))}
+
+@pytest.mark.parametrize('surname', SURNAMES)
+def test_adjacent_swap_finds_surname(index, surname):
+    missed = [typo for typo in swaps(surname) if not found(index, typo, surname)]
+    assert not missed
+
+@pytest.mark.parametrize('surname', SURNAMES)
+def test_missing_letter_finds_surname(index, surname):
+    missed = [typo for typo in drops(surname) if not found(index, typo, surname)]
+    assert not missed
+
+@pytest.mark.parametrize('surname', SURNAMES)
+def test_doubled_letter_finds_surname(index, surname):
+    missed = [typo for typo in doubles(surname) if not found(index, typo, surname)]
+    assert not missed
+
+@pytest.mark.parametrize('row', ROWS[::7], ids=lambda row: f"{row['first_name']} {row['last_name']}")
+def test_full_name_with_swapped_surname_ranks_first(index, row):
+    last = fold(row['last_name'])
+    for typo in swaps(last):
+        top = index.search(f"{row['first_name']} {typo}")[0]
+        assert fold(top['full_name']) == fold(f"{row['first_name']} {row['last_name']}"), typo
+
+def test_exact_name_ranks_first(index):
+    for row in ROWS:
+        name = f"{row['first_name']} {row['last_name']}"
+        assert fold(index.search(name)[0]['full_name']) == fold(name)
+
+def test_accents_and_apostrophes_are_ignored():
+    index = GuestIndex([{'id': 1, 'full_name': "Zoë O'Brien"}, {'id': 2, 'full_name': 'Siobhán Murphy'}])
+    assert index.search('zoe obrien')[0]['id'] == 1
+    assert index.search('siobhan')[0]['id'] == 2
+    assert index.search('obrein')[0]['id'] == 1